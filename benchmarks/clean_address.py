@@ -0,0 +1,102 @@
+"""
+Measure the addresses per second that CanadianPerson.clean_address cleans.
+
+    python -m benchmarks.clean_address [datadir]
+
+The addresses are read from the memberships in pupa's scraped output (by default, in SCRAPED_DATA_DIR), or from a
+sample of city hall addresses if there is no scraped output. The current implementation is compared to the
+implementation that built and ran one regular expression per province or territory name.
+"""
+
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from pupa import settings
+
+from utils import clean_address, clean_string, province_or_territory_abbreviations
+
+# Used if there is no scraped output. Each address is repeated, as in scraped output, in which most councillors share
+# their city hall's address.
+SAMPLE = [
+    "City Hall\n110 Laurier Avenue West\nOttawa, Ontario  K1P 1J1",
+    "100 Queen Street West\nToronto, ON M5H 2N2",
+    "275, rue Notre-Dame Est\nMontréal (Québec) H2Y 1C6",
+    "2, rue des Jardins\nQuébec, Québec\nG1R 4S9",
+    "800 Smithe Street\nVancouver, British Columbia V6Z 2E1\nCanada",
+    "P.O. Box 2100, Station M\nCalgary, Alberta T2P 2M5",
+    "1 Sir Winston Churchill Square\nEdmonton AB T5J 2R7",
+    "510 Main Street\nWinnipeg, Manitoba R3B 1B9",
+    "222 3rd Avenue North\nSaskatoon, Saskatchewan S7K 0J5",
+    "1841 Argyle Street\nHalifax, Nova Scotia, Canada B3J 3A5",
+    "397 Queen Street\nFredericton, New Brunswick E3B 1B5",
+    "10 New Gower Street\nSt. John's, Newfoundland and Labrador A1C 5M2",
+    "199 Queen Street\nCharlottetown, PEI C1A 4B7",
+    "4807 52nd Street\nYellowknife, Northwest Territories X1A 2N5",
+    "2121 2nd Avenue\nWhitehorse, Yukon Y1A 1C2",
+    "901 Niaqunngusiaq Road\nIqaluit, Nunavut X0A OH0",
+    "25, rue Laurier\nGatineau (Québec)  J8X 3Y9",
+    "71 Main Street West\nHamilton, Ontario L8P 4Y5",
+    "300 Dufferin Avenue\nLondon ON N6A 4L9",
+    "1 Centre Street\nMoncton, Nouveau-Brunswick E1C 4Z9",
+]
+
+
+def scraped_addresses(datadir):
+    addresses = []
+    for path in glob.glob(os.path.join(datadir, "*", "membership_*.json")):
+        with open(path) as f:
+            membership = json.load(f)
+        addresses.extend(
+            contact_detail["value"]
+            for contact_detail in membership["contact_details"]
+            if contact_detail["type"] == "address"
+        )
+    return addresses
+
+
+def legacy_clean_address(s):
+    s = re.sub(r"\b[A-Z][O0-9][A-Z]\s?[O0-9][A-Z][O0-9]\b", lambda x: x.group(0).replace("O", "0"), clean_string(s))
+    for k, v in province_or_territory_abbreviations().items():
+        s = re.sub(
+            r"[,\n ]+"
+            r"\(?" + k + r"\)?"
+            r"(?=(?:[,\n ]+Canada)?(?:[,\n ]+[A-Z][0-9][A-Z]\s?[0-9][A-Z][0-9])?\Z)",
+            " " + v,
+            s,
+        )
+    return re.sub(
+        r"[,\n ]+" r"([A-Z]{2})" r"(?:[,\n ]+Canada)?" r"[,\n ]+([A-Z][0-9][A-Z])\s?([0-9][A-Z][0-9])" r"\Z",
+        r" \1  \2 \3",
+        s,
+    )
+
+
+def rate(function, addresses):
+    start = time.perf_counter()
+    for address in addresses:
+        function(address)
+    duration = time.perf_counter() - start
+    return f"{len(addresses)} addresses in {duration:.2f}s: {len(addresses) / duration:,.0f} addresses/s"
+
+
+def main():
+    datadir = sys.argv[1] if len(sys.argv) > 1 else settings.SCRAPED_DATA_DIR
+    addresses = scraped_addresses(datadir) or SAMPLE * 250
+    print(f"{len(addresses)} addresses, {len(set(addresses))} distinct")
+
+    expected = [legacy_clean_address(address) for address in addresses]
+    assert [clean_address.__wrapped__(address) for address in addresses] == expected
+    province_or_territory_abbreviations()  # warm the memo
+
+    print(f"legacy:           {rate(legacy_clean_address, addresses)}")
+    print(f"single pass:      {rate(clean_address.__wrapped__, addresses)}")
+    clean_address.cache_clear()
+    print(f"single pass, LRU: {rate(clean_address, addresses)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Measure the rows per second that CSVScraper normalizes and scrapes, on a synthetic CSV.
+
+    python -m benchmarks.csv_rows [rows]
+
+The row normalization is compared to the per-row logic that CSVScraper.scrape used before its row pipeline.
+"""
+
+import csv
+import re
+import sys
+import time
+from io import BytesIO, StringIO
+
+import requests
+
+from utils import CSVScraper, facebook_query_re, uppercase_re
+
+ROLES = ["Councillor", "Councillor et membre du comité exécutif", "Maire; Membre du conseil", "mayor"]
+
+
+def synthetic_csv(rows):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(
+        [
+            "District name",
+            "Primary role",
+            "First name",
+            "Last name",
+            "Gender",
+            "Email",
+            "Phone",
+            "Fax",
+            "Address line 1",
+            "Address line 2",
+            "Locality",
+            "Province",
+            "Postal code",
+            "Facebook",
+            "Website",
+        ]
+    )
+    for i in range(rows):
+        writer.writerow(
+            [
+                f"Ward {i % 25 + 1}",
+                ROLES[i % len(ROLES)],
+                "Jean-François",
+                "TREMBLAY" if i % 2 else "O'Brien",
+                "M" if i % 2 else "F",
+                f"councillor{i}@example.ca",
+                f"(613) 555-{i % 10000:04d} ext. 12",
+                "613.555.0000",
+                "110 Laurier Avenue West",
+                "2nd Floor",
+                "Ottawa",
+                "Ontario",
+                "K1P 1J1",
+                f"https://www.facebook.com/councillor{i}?ref=br_rs",
+                f"www.example.ca/{i}",
+            ]
+        )
+    return buffer.getvalue().encode()
+
+
+class Jurisdiction:
+    classification = "legislature"
+    division_name = "Ottawa"
+
+
+class BenchmarkScraper(CSVScraper):
+    csv_url = "https://example.ca/councillors.csv"
+    corrections = {
+        "district name": {"Ward 1": "Ward One"},
+        "gender": lambda value: value.lower(),
+    }
+
+    def get(self, url, **kwargs):  # noqa: ARG002
+        response = requests.Response()
+        response.status_code = 200
+        response.encoding = "utf-8"
+        response.raw = BytesIO(self.content)
+        return response
+
+
+def legacy_normalize(scraper, row):
+    """Normalize a row, and return its name, role and district, as CSVScraper.scrape did before its row pipeline."""
+    if row.get("primary role"):
+        row["primary role"] = re.split(r"(?: (?:et)\b|[;\n])", row["primary role"], maxsplit=1)[0].strip()
+
+    if not scraper.is_valid_row(row):
+        return None
+
+    for key, corrections in scraper.corrections.items():
+        if not isinstance(corrections, dict):
+            row[key] = corrections(row[key])
+        elif row[key] in corrections:
+            row[key] = corrections[row[key]]
+
+    if row.get("last name") and not re.search(r"[a-z]", row["last name"]):
+        row["last name"] = re.sub(r"(?<=\b[A-Z])[A-ZÀÈÉ]+\b", lambda x: x.group(0).lower(), row["last name"])
+
+    if row.get("first name") and row.get("last name"):
+        name = "{} {}".format(row["first name"], row["last name"])
+    else:
+        name = row["name"]
+
+    role = row["primary role"]
+    if role not in ("candidate", "member") and not re.search(r"[A-Z]", role):
+        role = role.capitalize()
+
+    if scraper.district_name_format_string:
+        if row["district id"]:
+            district = scraper.district_name_format_string.format(**row)
+        else:
+            district = scraper.jurisdiction.division_name
+    elif scraper.district_name_format_callback:
+        if row.get("district name"):
+            district = scraper.district_name_format_callback(row["district name"])
+        else:
+            district = scraper.district_name_format_callback(scraper.jurisdiction.division_name)
+    elif row.get("district name"):
+        district = row["district name"]
+    elif scraper.fallbacks.get("district name"):
+        district = row[scraper.fallbacks["district name"]] or scraper.jurisdiction.division_name
+    else:
+        district = scraper.jurisdiction.division_name
+    district = district.replace("–", "—")
+
+    if row.get("facebook"):
+        re.sub(r"[#?].+", "", row["facebook"])
+
+    return name, role, district
+
+
+def pipeline_normalize(scraper, rows):
+    """Normalize rows, and return their names, roles and districts, using CSVScraper's row pipeline."""
+    steps = scraper.row_steps(list(rows[0]))
+    format_district = scraper.district_formatter()
+    for row in rows:
+        for step in steps:
+            if not step(row):
+                break
+        else:
+            role = row["primary role"]
+            if role not in ("candidate", "member") and not uppercase_re.search(role):
+                role = role.capitalize()
+            district = format_district(row).replace("–", "—")
+            if row.get("facebook"):
+                facebook_query_re.sub("", row["facebook"])
+            if row.get("first name") and row.get("last name"):
+                name = "{} {}".format(row["first name"], row["last name"])
+            else:
+                name = row["name"]
+            yield name, role, district
+
+
+def rate(function, count):
+    start = time.perf_counter()
+    function()
+    duration = time.perf_counter() - start
+    return f"{count} rows in {duration:.2f}s: {count / duration:,.0f} rows/s"
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    scraper = BenchmarkScraper(Jurisdiction(), ".")
+    scraper.content = synthetic_csv(rows)
+    records = list(csv.DictReader(StringIO(scraper.content.decode())))
+    for record in records:
+        for key in list(record):
+            record[scraper.header_converter(key)] = record.pop(key)
+
+    legacy_rows = [dict(record) for record in records]
+    pipeline_rows = [dict(record) for record in records]
+    legacy = rate(lambda: [legacy_normalize(scraper, row) for row in legacy_rows], rows)
+    pipeline = rate(lambda: list(pipeline_normalize(scraper, pipeline_rows)), rows)
+    scrape = rate(lambda: sum(1 for _ in scraper.scrape()), rows)
+
+    print(f"row normalization (legacy):   {legacy}")
+    print(f"row normalization (pipeline): {pipeline}")
+    print(f"CSVScraper.scrape:            {scrape}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Measure where the time and memory of each module's scrape go, against its recorded fixtures.
+
+    python -m benchmarks.pipeline [--repeat N] [--output report.json] [module ...]
+
+Record fixtures first (see the `fixtures` module). By default, every module with fixtures is run. Each run is a
+separate process, so that each module's peak RSS is its own, and nothing is cached between runs. The scrape's time is
+split into phases:
+
+- fetch: requests, answered from the fixtures
+- parse: parsing HTML, XML and CSV documents
+- clean: constructing and cleaning `CanadianPerson` objects, i.e. `__init__`, `__setattr__`, `add_contact` and
+  `add_link`, which call `clean_name`, `clean_string`, `clean_address` and `clean_telephone_number`
+- validate: validating the objects against pupa's schemas, as patched by `patch.py`
+- serialize: serializing the objects to JSON files in the data directory (a temporary directory)
+- other: the rest of the scrape, e.g. the scraper's own extraction
+
+fetch and parse are read from the scrape's timings. The other phases' times exclude any phase nested within them.
+Times in different threads are added, so the phases can add up to more than the wall time. If a module is run more
+than once, the median of each number is reported.
+
+Compare two reports with `invoke diff_benchmarks before.json after.json`.
+"""
+
+import argparse
+import functools
+import glob
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from pupa.scrape import Scraper
+from pupa.scrape.base import BaseModel
+
+import fixtures
+import patch
+import utils
+from tasks import jurisdiction
+
+PHASES = ("fetch", "parse", "clean", "validate", "serialize", "other")
+# Increment if the format of the report changes.
+VERSION = 1
+
+
+class Clock:
+    """Add up the time spent in each phase, excluding the time spent in phases nested within it, per thread."""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def wrap(self, phase, function):
+        """Return a function that calls the function, and counts its time as the phase's."""
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            stack = self.local.__dict__.setdefault("stack", [])
+            now = time.perf_counter()
+            if stack:
+                self.add(stack[-1][0], now - stack[-1][1])
+            stack.append([phase, now])
+            try:
+                return function(*args, **kwargs)
+            finally:
+                now = time.perf_counter()
+                self.add(phase, now - stack.pop()[1])
+                if stack:
+                    stack[-1][1] = now
+
+        return wrapper
+
+    def add(self, phase, seconds):
+        with self.lock:
+            self.seconds[phase] += seconds
+
+
+def rss_mb():
+    """Return the peak resident set size of this process, in MB."""
+    # ru_maxrss is in kilobytes on Linux, and in bytes on macOS.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1e6 if sys.platform == "darwin" else 1e3)
+
+
+def measure(module_name):
+    """Scrape a module against its fixtures, in this process, and return its measurements."""
+    clock = Clock()
+    for name in ("__init__", "__setattr__", "add_contact", "add_link"):
+        setattr(utils.CanadianPerson, name, clock.wrap("clean", getattr(utils.CanadianPerson, name)))
+    BaseModel.validate = clock.wrap("validate", BaseModel.validate)
+    patch.validate_objects = clock.wrap("validate", patch.validate_objects)
+    utils.CanadianScraper.save_object = clock.wrap("serialize", utils.CanadianScraper.save_object)
+    Scraper.save_object = clock.wrap("serialize", Scraper.save_object)
+
+    juris = jurisdiction(module_name)
+    baseline_rss = rss_mb()
+    with tempfile.TemporaryDirectory() as datadir:
+        scraper = juris.scrapers["people"](juris, datadir)
+        start = time.perf_counter()
+        record = scraper.do_scrape()
+        seconds = time.perf_counter() - start
+        output_bytes = sum(os.path.getsize(os.path.join(datadir, name)) for name in os.listdir(datadir))
+
+    phases = dict(clock.seconds)
+    phases["fetch"] = sum(timing["seconds"] for timing in scraper.timings if timing["type"] == "request")
+    phases["parse"] = sum(timing["seconds"] for timing in scraper.timings if timing["type"] == "parse")
+    phases["other"] = max(seconds - sum(phases[phase] for phase in PHASES if phase != "other"), 0)
+    return {
+        "seconds": seconds,
+        "phases": phases,
+        "requests": scraper.fixtures.replayed,
+        "objects": dict(record["objects"]),
+        "output_bytes": output_bytes,
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": rss_mb(),
+    }
+
+
+def run(module_name):
+    """Measure a module in a new process, and return its measurements, or its error."""
+    process = subprocess.run(  # noqa: S603
+        [sys.executable, "-m", "benchmarks.pipeline", "--measure", module_name],
+        env={**os.environ, "FIXTURES": fixtures.REPLAY},
+        capture_output=True,
+        check=False,
+    )
+    if process.returncode:
+        lines = process.stderr.decode(errors="replace").strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit status {process.returncode}"}
+    return json.loads(process.stdout.decode().strip().splitlines()[-1])
+
+
+def median(runs):
+    """Return the median of each number in the measurements of the runs of a module."""
+    return {
+        "runs": len(runs),
+        "seconds": round(statistics.median(run["seconds"] for run in runs), 4),
+        "phases": {phase: round(statistics.median(run["phases"][phase] for run in runs), 4) for phase in PHASES},
+        "requests": runs[0]["requests"],
+        "objects": runs[0]["objects"],
+        "output_bytes": runs[0]["output_bytes"],
+        "baseline_rss_mb": round(statistics.median(run["baseline_rss_mb"] for run in runs), 1),
+        "peak_rss_mb": round(statistics.median(run["peak_rss_mb"] for run in runs), 1),
+    }
+
+
+def commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()  # noqa: S607
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", help="the modules to run (by default, all with fixtures)")
+    parser.add_argument("--repeat", type=int, default=1, help="the number of times to run each module")
+    parser.add_argument("--output", default="benchmark.json", help="the file to which to write the report")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure)))
+        return
+
+    module_names = args.modules or sorted(
+        os.path.basename(path)[: -len(".zip")] for path in glob.glob(fixtures.archive_path("*"))
+    )
+    if not module_names:
+        sys.exit(f"No fixtures in {fixtures.DIRECTORY}")
+
+    modules = {}
+    print(f"{'module':<50} {'seconds':>8} " + " ".join(f"{phase:>9}" for phase in PHASES) + f" {'peak MB':>8}")
+    for module_name in module_names:
+        runs = [run(module_name) for _ in range(args.repeat)]
+        errors = [result["error"] for result in runs if "error" in result]
+        if errors:
+            modules[module_name] = {"error": errors[0]}
+            print(f"{module_name:<50} {errors[0]}")
+            continue
+        modules[module_name] = median(runs)
+        result = modules[module_name]
+        print(
+            f"{module_name:<50} {result['seconds']:>8.3f} "
+            + " ".join(f"{result['phases'][phase]:>9.3f}" for phase in PHASES)
+            + f" {result['peak_rss_mb']:>8.1f}"
+        )
+
+    measured = [result for result in modules.values() if "error" not in result]
+    report = {
+        "version": VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "totals": {
+            "seconds": round(sum(result["seconds"] for result in measured), 4),
+            "phases": {phase: round(sum(result["phases"][phase] for result in measured), 4) for phase in PHASES},
+            "max_peak_rss_mb": max((result["peak_rss_mb"] for result in measured), default=None),
+            "errors": len(modules) - len(measured),
+        },
+        "modules": modules,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Measure the per-page cost of parsing a page and extracting a person's details with XPath.
+
+    python -m benchmarks.xpath [directory]
+
+The pages are the `*.html` files in the directory, or synthetic pages like a member's page on ourcommons.ca if no
+directory is given. The details are extracted as by the `ca` scraper and by `get_email`, `get_phone` and `get_link`.
+Calling `node.xpath(expression)`, which compiles the expression at every call, is compared to `CanadianScraper.xpath`,
+which compiles each expression once.
+"""
+
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import lxml.html
+
+from ca import Canada
+from utils import CanadianScraper
+
+PAGE = """<html><head><title>{name}</title></head><body>
+<nav>{nav}</nav>
+<div class="ce-mip-mp-profile-container"><img src="/Content/Parliamentarians/Images/OfficialMPPhotos/44/{n}.jpg"></div>
+<dl><dt>Preferred Language:</dt><dd>English</dd></dl>
+<div id="roles"><h4>Offices and Roles</h4><ul><li>Member of the Standing Committee on Finance</li></ul></div>
+<div id="contact"><div>
+  <p><a href="mailto:member{n}@parl.gc.ca">member{n}@parl.gc.ca</a></p>
+  <p><a title="Website" href="https://member{n}.example.ca/">Website</a></p>
+  <h4>Hill Office</h4>
+  <p>House of Commons<br>Ottawa, Ontario<br>Canada<br>K1A 0A6</p>
+  <p>Telephone: 613-992-{n:04d}<br>Fax: 613-995-{n:04d}</p>
+  <p><a href="tel:613-992-{n:04d}">Call</a> <a href="https://twitter.com/member{n}">Twitter</a></p>
+</div></div>
+<div class="ce-mip-contact-constituency-office-container">
+  <div><p>123 Main Street<br>Suite {n}<br>Anytown, Ontario<br>K0A 1A0</p><p>Telephone: 613-555-{n:04d}<br>Fax: 613-555-{n:04d}</p></div>
+  <div><p>45 Second Avenue<br>Othertown, Ontario<br>K0B 1B0</p><p>Telephone: 613-556-{n:04d}</p></div>
+</div>
+<footer>{footer}</footer>
+</body></html>"""
+
+EXPRESSIONS = {
+    "photo": './/div[@class="ce-mip-mp-profile-container"]//img/@src',
+    "website": './/a[contains(@title, "Website")]/@href',
+    "languages": './/dt[contains(., "Preferred Language")]/following-sibling::dd/text()',
+    "roles": '//h4[contains(., "Offices and Roles")]/following-sibling::ul[1]/li/text()',
+    "voice": './/h4[contains(., "Hill Office")]/../p[contains(., "Telephone")]',
+    "fax": './/h4[contains(., "Hill Office")]/../p[contains(., "Fax")]',
+    "offices": './/div[@class="ce-mip-contact-constituency-office-container"]/div',
+    "office_address": "./p[1]",
+    "office_voice": './p[contains(., "Telephone")]',
+}
+
+
+def synthetic_pages(count=300):
+    nav = "".join(f'<a href="/Members/en/{i}">Link {i}</a>' for i in range(200))
+    footer = "".join(f"<p>Footer paragraph {i} with info@example.ca</p>" for i in range(20))
+    return [PAGE.format(name=f"Member {n}", n=n, nav=nav, footer=footer).encode() for n in range(count)]
+
+
+def saved_pages(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    return pages
+
+
+def extract(scraper, page):
+    """Extract a person's details from a page."""
+    xpath = scraper.xpath
+    details = {
+        key: [str(value) for value in xpath(page, EXPRESSIONS[key])] for key in ("photo", "website", "languages")
+    }
+    details["roles"] = [str(value) for value in xpath(page, EXPRESSIONS["roles"])]
+    details["voice"] = [node.text_content() for node in xpath(page, EXPRESSIONS["voice"])]
+    details["fax"] = [node.text_content() for node in xpath(page, EXPRESSIONS["fax"])]
+    details["offices"] = [
+        (
+            [node.text_content() for node in xpath(office, EXPRESSIONS["office_address"])],
+            [node.text_content() for node in xpath(office, EXPRESSIONS["office_voice"])],
+        )
+        for office in xpath(page, EXPRESSIONS["offices"])
+    ]
+    details["email"] = scraper.get_email(page, '//*[@id="contact"]/div/p/a', error=False)
+    details["phone"] = scraper.get_phone(page, error=False)
+    details["link"] = scraper.get_link(page, "twitter.com", error=False)
+    return details
+
+
+class LegacyScraper(CanadianScraper):
+    """Evaluates expressions with `node.xpath`, like `get_email`, `get_phone` and `get_link` did."""
+
+    def xpath(self, node, expression, **variables):
+        if variables:
+            # get_link formatted its substring into its expression.
+            expression = expression.replace("$substring", f'"{variables["substring"]}"')
+        return node.xpath(expression)
+
+
+def rate(function, pages):
+    start = time.perf_counter()
+    for page in pages:
+        function(page)
+    duration = time.perf_counter() - start
+    return f"{len(pages)} pages in {duration:.3f}s: {duration / len(pages) * 1e6:,.0f} µs/page"
+
+
+def main():
+    pages = saved_pages(sys.argv[1]) if len(sys.argv) > 1 else synthetic_pages()
+    if not pages:
+        sys.exit("No *.html files in the directory")
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages):,.0f} bytes/page")
+
+    datadir = tempfile.mkdtemp()
+    legacy = LegacyScraper(Canada(), datadir)
+    current = CanadianScraper(Canada(), datadir)
+
+    trees = [lxml.html.fromstring(page) for page in pages]
+    expected = [extract(legacy, tree) for tree in trees]
+    assert [extract(current, tree) for tree in trees] == expected
+
+    print(f"parse:                       {rate(lxml.html.fromstring, pages)}")
+    print(f"extract, node.xpath:         {rate(lambda tree: extract(legacy, tree), trees)}")
+    print(f"extract, compiled:           {rate(lambda tree: extract(current, tree), trees)}")
+    print(f"parse and extract, compiled: {rate(lambda page: extract(current, lxml.html.fromstring(page)), pages)}")
+
+
+if __name__ == "__main__":
+    main()
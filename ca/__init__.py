@@ -1,8 +1,8 @@
 from datetime import datetime
 
-from opencivicdata.divisions import Division
 from pupa.scrape import Organization
 
+from divisions import Division
 from utils import CanadianJurisdiction
 
 
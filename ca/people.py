@@ -1,9 +1,6 @@
-import hashlib
 import re
 
-from opencivicdata.divisions import Division
-from unidecode import unidecode
-
+from districts import federal_electoral_districts
 from utils import CanadianPerson as Person
 from utils import CanadianScraper
 
@@ -12,16 +9,6 @@ COUNCIL_PAGE_MALE = "https://www.ourcommons.ca/Members/en/search?caucusId=all&pr
 COUNCIL_PAGE_FEMALE = "https://www.ourcommons.ca/Members/en/search?caucusId=all&province=all&gender=F"
 IMAGE_PLACEHOLDER_SHA1 = ["e4060a9eeaf3b4f54e6c16f5fb8bf2c26962e15d"]
 
-TRANSLATION_TABLE = str.maketrans("\u2013\u2014-", "   ", "\u200f")  # n-dash, m-dash, right-to-left mark
-CONSECUTIVE_WHITESPACE_REGEX = re.compile(r"\s+")
-CORRECTIONS = {
-    # Different names.
-    "Kelowna Lake Country": "Kelowna",
-    "Nonafot Nunavut": "Nunavut",
-    # Typographic errors.
-    "Northwest Territores": "Northwest Territories",
-}
-
 
 class CanadaPersonScraper(CanadianScraper):
     """
@@ -30,22 +17,13 @@ class CanadaPersonScraper(CanadianScraper):
     contact information or photo URLs.
     """
 
-    normalized_names = {}
-
-    def normalize_district(self, district):
-        # Ignore accents, hyphens, lettercase, and leading, trailing and consecutive whitespace.
-        district = unidecode(district.translate(TRANSLATION_TABLE)).title().strip()
-        district = CONSECUTIVE_WHITESPACE_REGEX.sub(" ", district)
-        return CORRECTIONS.get(district, district)
+    image_placeholders = IMAGE_PLACEHOLDER_SHA1
 
     def is_valid_telephone_number(self, string):
         return len(re.sub(r"\D", "", string)) in {7, 10, 11}
 
     def scrape(self):
-        # Create list mapping names to IDs.
-        for division in Division.get("ocd-division/country:ca").children("ed"):
-            if "2023" in division.id:
-                self.normalized_names[self.normalize_district(division.name)] = division.name
+        self.districts = federal_electoral_districts()
 
         genders = {"male": COUNCIL_PAGE_MALE, "female": COUNCIL_PAGE_FEMALE}
         for gender, url in genders.items():
@@ -55,24 +33,26 @@ class CanadaPersonScraper(CanadianScraper):
 
     def scrape_people(self, rows, gender):
         assert len(rows), "No members found"
-        for row in rows:
-            name = row.xpath('.//div[@class="ce-mip-mp-name"][1]')[0].text_content()
-            constituency = row.xpath('.//div[@class="ce-mip-mp-constituency"][1]')[0].text_content()
-            constituency = self.normalized_names[self.normalize_district(constituency)]
 
-            province = row.xpath('.//div[@class="ce-mip-mp-province"][1]')[0].text_content()
+        urls = []
+        for row in rows:
+            url = self.xpath(row, './/a[@class="ce-mip-mp-tile"]/@href')[0]
+            if self.xpath(row, './/div[@class="ce-mip-mp-province"][1]')[0].text_content() == "Québec":
+                url = url.replace("/en/", "/fr/")
+            urls.append(url)
 
-            party = row.xpath('.//div[@class="ce-mip-mp-party"][1]')[0].text_content()
+        for row, url, mp_page in zip(rows, urls, self.lxmlize_many(urls)):
+            name = self.xpath(row, './/div[@class="ce-mip-mp-name"][1]')[0].text_content()
+            constituency = self.xpath(row, './/div[@class="ce-mip-mp-constituency"][1]')[0].text_content()
+            constituency = self.districts.resolve(constituency).name
 
-            url = row.xpath('.//a[@class="ce-mip-mp-tile"]/@href')[0]
+            province = self.xpath(row, './/div[@class="ce-mip-mp-province"][1]')[0].text_content()
 
-            if province == "Québec":
-                url = url.replace("/en/", "/fr/")
+            party = self.xpath(row, './/div[@class="ce-mip-mp-party"][1]')[0].text_content()
 
-            mp_page = self.lxmlize(url)
             email = self.get_email(mp_page, '//*[@id="contact"]/div/p/a', error=False)
 
-            photo = mp_page.xpath('.//div[@class="ce-mip-mp-profile-container"]//img/@src')[0]
+            photo = self.xpath(mp_page, './/div[@class="ce-mip-mp-profile-container"]//img/@src')[0]
 
             m = Person(primary_org="lower", name=name, district=constituency, role="MP", party=party)
             m.add_source(COUNCIL_PAGE)
@@ -82,22 +62,17 @@ class CanadaPersonScraper(CanadianScraper):
             if email:
                 m.add_contact("email", email)
 
-            if photo:
-                # Determine whether the photo is actually a generic silhouette
-                photo_response = self.get(photo)
-                if (
-                    photo_response.status_code == 200
-                    and hashlib.sha1(photo_response.content).hexdigest() not in IMAGE_PLACEHOLDER_SHA1  # noqa: S324 # non-cryptographic
-                ):
-                    m.image = photo
+            # Determine whether the photo is actually a generic silhouette
+            if photo and self.has_photo(photo):
+                m.image = photo
 
             # The "Personal Web Site" section changed to "Website" some time around 2019
-            personal_url = mp_page.xpath('.//a[contains(@title, "Website")]/@href')
+            personal_url = self.xpath(mp_page, './/a[contains(@title, "Website")]/@href')
             if personal_url:
                 m.add_link(personal_url[0])
 
-            preferred_languages = mp_page.xpath(
-                './/dt[contains(., "Preferred Language")]/following-sibling::dd/text()'
+            preferred_languages = self.xpath(
+                mp_page, './/dt[contains(., "Preferred Language")]/following-sibling::dd/text()'
             )
 
             if preferred_languages:
@@ -105,8 +80,10 @@ class CanadaPersonScraper(CanadianScraper):
                     language.replace("/", "").strip() for language in preferred_languages
                 ]
 
-            roles_node = mp_page.xpath('.//div[@id="roles"]')
-            roles = roles_node[0].xpath('//h4[contains(., "Offices and Roles")]/following-sibling::ul[1]/li/text()')
+            roles_node = self.xpath(mp_page, './/div[@id="roles"]')
+            roles = self.xpath(
+                roles_node[0], '//h4[contains(., "Offices and Roles")]/following-sibling::ul[1]/li/text()'
+            )
             if roles:
                 m.extras["roles"] = roles
 
@@ -121,11 +98,13 @@ class CanadaPersonScraper(CanadianScraper):
             #   Telephone: xxx-xxx-xxxx<br/>
             #   Fax: xxx-xxx-xxx
             # </p>
-            phone_el = mp_page.xpath(
-                './/h4[contains(., "Hill Office")]/../p[contains(., "Telephone")]|.//h4[contains(., "Hill Office")]/../p[contains(., "Téléphone :")]'
+            phone_el = self.xpath(
+                mp_page,
+                './/h4[contains(., "Hill Office")]/../p[contains(., "Telephone")]|.//h4[contains(., "Hill Office")]/../p[contains(., "Téléphone :")]',
             )
-            fax_el = mp_page.xpath(
-                './/h4[contains(., "Hill Office")]/../p[contains(., "Fax")]|.//h4[contains(., "Hill Office")]/../p[contains(., "Télécopieur :")]'
+            fax_el = self.xpath(
+                mp_page,
+                './/h4[contains(., "Hill Office")]/../p[contains(., "Fax")]|.//h4[contains(., "Hill Office")]/../p[contains(., "Télécopieur :")]',
             )
 
             if phone_el:
@@ -143,19 +122,19 @@ class CanadaPersonScraper(CanadianScraper):
             # Constituency Office contacts
             # Some people has more than one, e.g. https://www.ourcommons.ca/Members/en/ben-lobb(35600)#contact
             for i, constituency_office_el in enumerate(
-                mp_page.xpath('.//div[@class="ce-mip-contact-constituency-office-container"]/div')
+                self.xpath(mp_page, './/div[@class="ce-mip-contact-constituency-office-container"]/div')
             ):
                 note = "constituency"
                 if i:
                     note += f" ({i + 1})"
 
-                address = constituency_office_el.xpath("./p[1]")[0]
+                address = self.xpath(constituency_office_el, "./p[1]")[0]
                 address = address.text_content().strip().splitlines()
                 address = list(map(str.strip, address))
                 m.add_contact("address", "\n".join(address), note)
 
-                phone_and_fax_el = constituency_office_el.xpath(
-                    './p[contains(., "Telephone")]|./p[contains(., "Téléphone")]'
+                phone_and_fax_el = self.xpath(
+                    constituency_office_el, './p[contains(., "Telephone")]|./p[contains(., "Téléphone")]'
                 )
                 if len(phone_and_fax_el):
                     phone_and_fax = phone_and_fax_el[0].text_content().strip().splitlines()
@@ -1,9 +1,9 @@
 # https://github.com/opencivicdata/scrapers-ca/blob/b19f84783efe046fac96426ebe6e1d7c8dcf1fcd/ca_candidates/__init__.py
 import re
 
-from opencivicdata.divisions import Division
 from pupa.scrape import Organization
 
+from divisions import Division
 from utils import CanadianJurisdiction
 
 
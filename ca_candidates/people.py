@@ -2,17 +2,20 @@
 import csv
 import json
 import logging
+import os
 import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from urllib.parse import urlsplit
 
 import lxml.etree
 import requests
 import scrapelib
-from opencivicdata.divisions import Division
 from pupa.utils import get_pseudo_id
 from unidecode import unidecode
 
+from districts import TRANSLATION_TABLE, federal_electoral_districts
 from utils import CUSTOM_USER_AGENT, CanadianScraper
 from utils import CanadianPerson as Person
 
@@ -26,61 +29,88 @@ SOCIAL_MEDIA_DOMAINS = (
 )
 CLEAN_EMAIL_REGEX = re.compile(r"mailto:|\?subject=.+")
 
-TRANSLATION_TABLE = str.maketrans("\u2013\u2014-", "   ", r"\u200f")  # n-dash, m-dash, right-to-left mark
 CONSECUTIVE_WHITESPACE_REGEX = re.compile(r"\s+")
-CORRECTIONS = {
-    # Different names.
-    "Kelowna Lake Country": "Kelowna",
-    "Nonafot Nunavut": "Nunavut",
-    # Typographic errors.
-    "Northwest Territores": "Northwest Territories",
+# The parties whose candidates are scraped from their websites, in the order in which they are merged.
+PARTIES = ("liberal", "ndp", "green", "conservative")
+# Map the registered domains of social media links to the crowdsourced fields.
+SOCIAL_MEDIA_FIELDS = {
+    "facebook.com": "facebook",
+    "fb.com": "facebook",
+    "instagram.com": "instagram",
+    "linkedin.com": "linkedin",
+    "twitter.com": "twitter",
+    "youtube.com": "youtube",
 }
+# Tracking parameters and suffixes of crowdsourced Facebook and Twitter URLs.
+SOCIAL_MEDIA_URL_SUFFIX_REGEX = re.compile(r"/timeline/\Z|\?(f?ref|lang|notif_t)=.+|\?_rdr\Z")
+# The conflict report is written to the data directory, which pupa's importer ignores.
+CONFLICTS_FILENAME = "conflicts.json"
 
 logger = logging.getLogger(__name__)
 
 
+class PersonIndex:
+    """An index of the values of a person's contact details by type, and of its social media links by field."""
+
+    def __init__(self, person):
+        self.person = person
+        self.contact_details = {}
+        for contact_detail in person._related[0].contact_details:
+            self.index_contact_detail(contact_detail)
+        self.links = {}
+        for link in person.links:
+            field = SOCIAL_MEDIA_FIELDS.get(".".join(urlsplit(link["url"]).netloc.split(".")[-2:]))
+            if field:
+                self.links[field] = link["url"]
+
+    def index_contact_detail(self, contact_detail):
+        self.contact_details.setdefault(contact_detail["type"], []).append(contact_detail["value"])
+
+    def first(self, type):
+        """Return the value of the person's first contact detail of a type, or None."""
+        values = self.contact_details.get(type)
+        return values[0] if values else None
+
+    def add_contact(self, type, value, note=""):
+        self.person.add_contact(type, value, note)
+        self.index_contact_detail(self.person._related[0].contact_details[-1])
+
+
 class CanadaCandidatesPersonScraper(CanadianScraper):
-    normalized_names = {}
     boundary_ids = {}
     elections_canada_candidates = {}
     division_map = {}
 
-    def normalize_district(self, district):
-        # Ignore accents, hyphens, lettercase, and leading, trailing and consecutive whitespace.
-        district = unidecode(district.translate(TRANSLATION_TABLE)).title().strip()
-        district = CONSECUTIVE_WHITESPACE_REGEX.sub(" ", district)
-        return CORRECTIONS.get(district, district)
-
     def normalized_candidate_names(self, candidate_name):
         candidate_name = unidecode(candidate_name.translate(TRANSLATION_TABLE)).title().strip()
         return CONSECUTIVE_WHITESPACE_REGEX.sub(" ", candidate_name)
 
     def get_district(self, district):
         try:
-            return self.normalized_names[self.normalize_district(district)]
-        except KeyError:
-            logger.exception("")
+            return self.districts.resolve(district).name
+        except LookupError as e:
+            self.warning(str(e))
 
     def scrape(self):
+        self.conflicts = []
+
         # Create list mapping names to IDs.
-        for division in Division.get("ocd-division/country:ca").children("ed"):
-            if "2023" in division.id:
-                self.normalized_names[self.normalize_district(division.name)] = division.name
-                self.normalized_names[self.normalize_district(division.attrs["name_fr"])] = division.name
-                self.boundary_ids[division.name] = re.search(r"(\d+)-2023\Z", division.id).group(1)
-                self.division_map[re.search(r"(\d+)-2023\Z", division.id).group(1)] = self.normalize_district(
-                    division.name
-                )
+        self.districts = federal_electoral_districts()
+        for division in self.districts.divisions:
+            boundary_id = re.search(r"(\d+)-2023\Z", division.id).group(1)
+            self.boundary_ids[division.name] = boundary_id
+            self.division_map[boundary_id] = division.name
 
         representatives = json.loads(
             self.get("http://represent.opennorth.ca/representatives/house-of-commons/?limit=0").text
         )["objects"]
         self.incumbents = [representative["name"] for representative in representatives]
 
-        crowdsourcing = {}
+        # Map keys like "party/boundary_id/name" to crowdsourced records.
+        self.crowdsourcing = {}
         url = "https://docs.google.com/spreadsheets/d/1g0yaE3dr8N7pF2K9TSp2VApJHmHDyGMqH6-Ba5SQLts/export?format=csv&id=1g0yaE3dr8N7pF2K9TSp2VApJHmHDyGMqH6-Ba5SQLts"
 
-        response = requests.get(url)
+        response = self.get(url)
         response.encoding = "utf-8"
 
         key = ""
@@ -106,8 +136,8 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
                     boundary_id = self.boundary_ids[boundary_id]
                 key = "{}/{}/{}".format(row["Party name"], boundary_id, row["Name"])
 
-                if crowdsourcing.get(key):
-                    self.warning(f"{key} already exists")
+                if self.crowdsourcing.get(key):
+                    self.add_conflict(key, "crowdsourcing", "duplicate")
                 else:
                     if row["Gender"] == "M":
                         gender = "male"
@@ -116,7 +146,7 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
                     else:
                         gender = None
 
-                    crowdsourcing[key] = {
+                    self.crowdsourcing[key] = {
                         "gender": gender,
                         "email": row["Email"],
                         "image": row["Photo URL"],
@@ -127,39 +157,17 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
                         "youtube": row["YouTube"],
                     }
 
-            steps = {
-                "gender": (
-                    lambda p: p.gender,
-                    lambda p, value: setattr(p, "gender", value),
-                ),
-                "email": (
-                    lambda p: next(
-                        (
-                            contact_detail["value"]
-                            for contact_detail in p._related[0].contact_details
-                            if contact_detail["type"] == "email"
-                        ),
-                        None,
-                    ),
-                    lambda p, value: p.add_contact("email", value),
-                ),
-                "image": (
-                    lambda p: p.image,
-                    lambda p, value: setattr(p, "image", value),
-                ),
-            }
-
         self.scrape_elections_canada()
 
-        for party in (
-            "liberal",
-            "ndp",
-            "green",
-            "conservative",
-            "missing_elections_canada",
-        ):
+        # Scrape the parties concurrently. Then, merge their candidates in a fixed order.
+        with ThreadPoolExecutor(max_workers=len(PARTIES)) as executor:
+            scraped = dict(zip(PARTIES, executor.map(self.scrape_party, PARTIES)))
+
+        for party in (*PARTIES, "missing_elections_canada"):
             try:
-                for p in getattr(self, f"scrape_{party}")():
+                # The candidates missing from the parties' websites are known only after merging the others.
+                people = scraped[party] if party in scraped else self.scrape_missing_elections_canada()
+                for p in people:
                     if not p._related[0].post_id:
                         raise Exception(f"No post_id for {p.name} of {p._related[1].organization_id}")
 
@@ -173,24 +181,8 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
                             raise Exception(f"KeyError: '{boundary_id.lower()}' on {party}") from None
 
                     key = f"{partyname}/{boundary_id}"
-                    try:
-                        elections_canada_candidate = self.elections_canada_candidates[key]
-                        phone_to_be_added = True
-                        if elections_canada_candidate["phone"] == "":
-                            phone_to_be_added = False
-                        for contact_detail in p._related[0].contact_details:
-                            if (
-                                phone_to_be_added
-                                and contact_detail["type"] == "voice"
-                                and contact_detail["value"]
-                                == p.clean_telephone_number(elections_canada_candidate["phone"])
-                            ):
-                                phone_to_be_added = False
-                        if phone_to_be_added:
-                            p.add_contact("voice", elections_canada_candidate["phone"], "Work")
-                        self.elections_canada_candidates[key]["processed"] = True
-                    except KeyError:
-                        self.warning(f"Candidate not present in elections canada scrpe {key}")
+                    index = PersonIndex(p)
+                    if not self.merge_elections_canada(key, index):
                         continue
 
                     # Names from Elections Canada may differ, but there may also be
@@ -214,54 +206,101 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
                         else:
                             seen[seen_key] = party
 
-                    # Merge the crowdsourced data.
-                    if crowdsourcing.get(key):
-                        o = crowdsourcing[key]
-
-                        links = {}
-                        for link in p.links:
-                            domain = ".".join(urlsplit(link["url"]).netloc.split(".")[-2:])
-                            if domain in ("facebook.com", "fb.com"):
-                                links["facebook"] = link["url"]
-                            elif domain == "instagram.com":
-                                links["instagram"] = link["url"]
-                            elif domain == "linkedin.com":
-                                links["linkedin"] = link["url"]
-                            elif domain == "twitter.com":
-                                links["twitter"] = link["url"]
-                            elif domain == "youtube.com":
-                                links["youtube"] = link["url"]
-
-                        for prop, (getter, setter) in steps.items():
-                            if o[prop]:
-                                if prop == "email" and ".gc.ca" in o[prop]:
-                                    self.info(f"{key}: skipping email = {o[prop]}")
-                                else:
-                                    scraped = getter(p)
-                                    if not scraped:
-                                        setter(p, o[prop])
-                                        self.debug(f"{key}: adding {prop} = {o[prop]}")
-                                    elif scraped.lower() != o[prop].lower() and prop != "image":
-                                        self.warning(f"{key}: expected {prop} to be {scraped}, not {o[prop]}")
-
-                        for prop in ["facebook", "instagram", "linkedin", "twitter", "youtube"]:
-                            if o[prop]:
-                                scraped = links.get(prop)
-                                entered = re.sub(
-                                    r"/timeline/\Z|\?(f?ref|lang|notif_t)=.+|\?_rdr\Z",
-                                    "",
-                                    o[prop].replace("@", "").replace("http://twitter.com/", "https://twitter.com/"),
-                                )  # Facebook, Twitter
-                                if not scraped:
-                                    p.add_link(entered)
-                                    self.debug(f"{key}: adding {prop} = {entered}")
-                                elif scraped.lower() != entered.lower():
-                                    self.warning(f"{key}: expected {prop} to be {scraped}, not {entered}")
+                    if self.crowdsourcing.get(key):
+                        self.merge_crowdsourcing(key, index, self.crowdsourcing[key])
                     yield p
 
             except IndexError:
                 logger.exception("")
 
+        self.write_conflicts()
+
+    def add_conflict(self, key, source, problem, field=None, scraped=None, reported=None):
+        """Record a disagreement between a source and the scraped candidates, for the conflict report."""
+        self.conflicts.append(
+            {
+                "candidate": key,
+                "source": source,
+                "problem": problem,
+                "field": field,
+                "scraped": scraped,
+                "reported": reported,
+            }
+        )
+
+    def write_conflicts(self):
+        """Write the conflict report to the data directory, and log a summary."""
+        path = os.path.join(self.datadir, CONFLICTS_FILENAME)
+        with open(path, "w") as f:
+            json.dump(self.conflicts, f, ensure_ascii=False, indent=2)
+        if self.conflicts:
+            counts = Counter(f"{conflict['source']} {conflict['problem']}" for conflict in self.conflicts)
+            summary = ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items()))
+            self.warning(f"{len(self.conflicts)} conflicts ({summary}) in {path}")
+
+    def merge_elections_canada(self, key, index):
+        """Add the candidate's phone number from Elections Canada, and return whether Elections Canada has the candidate."""
+        elections_canada_candidate = self.elections_canada_candidates.get(key)
+        if elections_canada_candidate is None:
+            self.add_conflict(key, "elections_canada", "missing")
+            return False
+
+        phone = elections_canada_candidate["phone"]
+        if phone and index.person.clean_telephone_number(phone) not in index.contact_details.get("voice", ()):
+            index.add_contact("voice", phone, "Work")
+        elections_canada_candidate["processed"] = True
+        return True
+
+    def merge_crowdsourcing(self, key, index, record):
+        """Add the crowdsourced data that the candidate is missing, and report the data that disagrees."""
+        p = index.person
+        for field in ("gender", "email", "image"):
+            value = record[field]
+            if not value:
+                continue
+            if field == "email" and ".gc.ca" in value:
+                self.info(f"{key}: skipping email = {value}")
+                continue
+
+            scraped = index.first("email") if field == "email" else getattr(p, field)
+            if not scraped:
+                if field == "email":
+                    index.add_contact("email", value)
+                else:
+                    setattr(p, field, value)
+                self.debug(f"{key}: adding {field} = {value}")
+            elif scraped.lower() != value.lower() and field != "image":
+                self.add_conflict(key, "crowdsourcing", "mismatch", field, scraped, value)
+
+        for field in ("facebook", "instagram", "linkedin", "twitter", "youtube"):
+            if record[field]:
+                scraped = index.links.get(field)
+                entered = SOCIAL_MEDIA_URL_SUFFIX_REGEX.sub(
+                    "", record[field].replace("@", "").replace("http://twitter.com/", "https://twitter.com/")
+                )
+                if not scraped:
+                    p.add_link(entered)
+                    self.debug(f"{key}: adding {field} = {entered}")
+                elif scraped.lower() != entered.lower():
+                    self.add_conflict(key, "crowdsourcing", "mismatch", field, scraped, entered)
+
+    def scrape_party(self, party):
+        """Return a party's candidates, up to the first candidate that is missing an element."""
+        people = []
+        try:
+            for p in getattr(self, f"scrape_{party}")():
+                people.append(p)  # noqa: PERF402 # keep the candidates before an IndexError
+        except IndexError:
+            logger.exception("")
+        return people
+
+    def map_candidates(self, function, candidates):
+        """Scrape candidates concurrently, and yield the people in order, skipping None."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for p in executor.map(function, candidates):
+                if p is not None:
+                    yield p
+
     def scrape_ndp(self):
         delete_regex = re.compile("[ '.-]")
 
@@ -271,10 +310,10 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
         candidates = page.xpath('//div[@class="campaign-civics-list-items"]/div')
         assert len(candidates), "No NDP candidates found"
 
-        for candidate in candidates:
+        def scrape_candidate(candidate):
             district = self.get_district(candidate.xpath("./div/div/div")[1].text_content())
             if district is None:
-                continue
+                return None
 
             name = candidate.xpath("./div/div/div")[0].text_content()
             image = f"https://www.ndp.ca{candidate.xpath('./div/img')[0].get('data-img-src')}"
@@ -329,7 +368,9 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
                 # lxml.etree.ParserError: Document is empty https://avilewis.ndp.ca
                 logger.exception("")
 
-            yield p
+            return p
+
+        yield from self.map_candidates(scrape_candidate, candidates)
 
     def scrape_liberal(self):
         start_url = "https://liberal.ca/your-liberal-candidates/"
@@ -338,15 +379,15 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
         candidates = page.xpath('//div[@class="person-listing-container"]/article')
         assert len(candidates), "No Liberal candidates found"
 
-        for candidate in candidates:
+        def scrape_candidate(candidate):
             district = self.get_district(candidate.xpath(".//h3[contains(@class, 'person__riding-name')]/text()")[0])
             if district is None:
-                continue
+                return None
 
             name = candidate.xpath(".//h2[contains(@class, 'person__name')]/text()")[0]
             # Liberal party has got the wrong name here as of 27.3.25
             if name == "Ron Thiering" and district == "Edmonton Strathcona":
-                continue
+                return None
 
             p = Person(primary_org="lower", name=name, district=district, role="candidate", party="Liberal Party")
             # image is still a div element -> extract url
@@ -373,27 +414,29 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
                     ) as e:
                         logger.warning("%s (%s)", e, link)
 
-            yield p
+            return p
+
+        yield from self.map_candidates(scrape_candidate, candidates)
 
     def scrape_green(self):
         start_url = "https://www.greenparty.ca/en/candidates/"
 
         candidates = []
-        for page_number in range(1, 343 // 20 + 1):  # 343 divisions, 20 candidates per page
-            url = f"{start_url}page/{page_number}"
-            try:
-                page = self.lxmlize(url)
-            except scrapelib.HTTPError as e:
-                logger.warning("%s (%s)", e, url)
+        urls = [
+            f"{start_url}page/{page_number}" for page_number in range(1, 343 // 20 + 1)
+        ]  # 343 divisions, 20 per page
+        for url, page in zip(urls, self.lxmlize_many(urls, errors=(scrapelib.HTTPError,))):
+            if isinstance(page, Exception):
+                logger.warning("%s (%s)", page, url)
             else:
                 candidates += page.xpath('.//div[@class="grid-4 gpc-candidates-grid"]/article')
 
         assert len(candidates), "No Green candidates found"
 
-        for candidate in candidates:
+        def scrape_candidate(candidate):
             district = self.get_district(candidate.xpath("./div/p/text()")[0])
             if district is None:
-                continue
+                return None
 
             name = "".join(candidate.xpath("./div/h2/a/text()"))
             name = self.normalized_candidate_names(name)
@@ -418,7 +461,9 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
                 if any(domain in link for domain in SOCIAL_MEDIA_DOMAINS):
                     p.add_link(link)
 
-            yield p
+            return p
+
+        yield from self.map_candidates(scrape_candidate, candidates)
 
     def scrape_conservative(self):
         start_url = "https://www.conservative.ca/candidates"
@@ -427,11 +472,11 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
         candidates = page.xpath('//div[@class="candidate-grid"]/div')
         assert len(candidates)
 
-        for candidate in candidates:
+        def scrape_candidate(candidate):
             name = CONSECUTIVE_WHITESPACE_REGEX.sub(" ", " ".join(candidate.xpath("./div/div/h3/text()")))
             district = self.get_district(candidate.xpath("./div/div/p")[0].text_content())
             if district is None:
-                continue
+                return None
 
             p = Person(primary_org="lower", name=name, district=district, role="candidate", party="Conservative Party")
 
@@ -466,14 +511,16 @@ class CanadaCandidatesPersonScraper(CanadianScraper):
             for link in candidate.xpath("./div/ul/li/a/@href"):
                 if any(domain in link for domain in SOCIAL_MEDIA_DOMAINS):
                     p.add_link(link)
-            yield p
+            return p
+
+        yield from self.map_candidates(scrape_candidate, candidates)
 
     def scrape_elections_canada(self):
         name = ""
         party = ""
 
         url_ec = "https://docs.google.com/spreadsheets/d/1vcG7xsvUMtxrYmaswGY4MMbVf_lwJp3yoCOe7U75cQ0/export?format=csv&id=1vcG7xsvUMtxrYmaswGY4MMbVf_lwJp3yoCOe7U75cQ0"
-        response_ec = requests.get(url_ec)
+        response_ec = self.get(url_ec)
         response_ec = response_ec.content.decode("utf-8", errors="replace").replace("\x00", "")
 
         for row in csv.DictReader(StringIO(response_ec)):
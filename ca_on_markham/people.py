@@ -18,10 +18,11 @@ class MarkhamPersonScraper(CanadianScraper):
         )
         assert len(councillors), "No councillors found"
 
-        for councillor in councillors:
+        councillors = [councillor for councillor in councillors if "Vacant" not in councillor.xpath(".//h3/text()")[0]]
+        urls = [councillor.xpath(".//a/@href")[0] for councillor in councillors]
+
+        for councillor, url, contact_page in zip(councillors, urls, self.lxmlize_many(urls)):
             name = councillor.xpath(".//h3/text()")[0].strip()
-            if "Vacant" in name:
-                continue
             district = councillor.xpath(".//p/text()")[0].strip()
 
             if "Ward" in district:
@@ -36,9 +37,8 @@ class MarkhamPersonScraper(CanadianScraper):
                 district = "Markham"
 
             image = councillor.xpath(".//img/@src")[0]
-            url = councillor.xpath(".//a/@href")[0]
 
-            address, phone, email, links = self.get_contact(url)
+            address, phone, email, links = self.get_contact(contact_page)
 
             p = Person(primary_org="legislature", name=name, district=district, role=role)
             p.add_source(COUNCIL_PAGE)
@@ -54,9 +54,7 @@ class MarkhamPersonScraper(CanadianScraper):
 
             yield p
 
-    def get_contact(self, url):
-        page = self.lxmlize(url)
-
+    def get_contact(self, page):
         contact_node = page.xpath(
             '//div[@class="pd-x-16 pd-y-32 bg-white committee-right-info-section layout__region layout__region--second"]'
         )[0]
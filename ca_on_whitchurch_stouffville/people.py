@@ -5,6 +5,7 @@ from utils import CSVScraper
 
 class WhitchurchStouffvillePersonScraper(CSVScraper):
     csv_url = "https://docs.google.com/spreadsheets/d/1wf91UJK7dluBFHV3v7ubINzL4lCxnoaFqRcYHdFv9oo/pub?gid=1235979741&single=true&output=csv"
+    read_whole_spreadsheet = True
     updated_at = date(2016, 11, 8)
     contact_person = "andrew@newmode.net, shamus@newmode.net"
     many_posts_per_area = True
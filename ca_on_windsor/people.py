@@ -41,10 +41,9 @@ class WindsorPersonScraper(CanadianScraper):
         }
         data = json.loads(self.post(DATA_URL, json=data_request).text)
         assert data["totalCount"] > 0, "No councillors found"
-        for response_item in data["value"]:
-            item = response_item["document"]
-            url = f"{BASE_URL}/directory/{item['Slug']}"
-            page = self.lxmlize(url)
+        items = [response_item["document"] for response_item in data["value"]]
+        urls = [f"{BASE_URL}/directory/{item['Slug']}" for item in items]
+        for item, url, page in zip(items, urls, self.lxmlize_many(urls)):
             phone = self.get_phone(page)
             email = item["mail"]
             name = item["displayName"]
@@ -1,6 +1,6 @@
-from opencivicdata.divisions import Division
 from pupa.scrape import Organization
 
+from divisions import Division
 from utils import CanadianJurisdiction
 
 
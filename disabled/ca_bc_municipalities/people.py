@@ -1,8 +1,9 @@
 import re
 
-from opencivicdata.divisions import Division
 from pupa.scrape import Organization
 
+from districts import DistrictResolver
+from divisions import Division
 from utils import CanadianPerson as Person
 from utils import CanadianScraper
 
@@ -33,9 +34,6 @@ class BritishColumbiaMunicipalitiesPersonScraper(CanadianScraper):
             "Islands Trust",
             "Mountain Resort Municipality",
         }
-        division_corrections = {
-            "100 Mile House": "One Hundred Mile House",
-        }
 
         processed_ids = set()
         exclude_divisions = {}
@@ -51,17 +49,18 @@ class BritishColumbiaMunicipalitiesPersonScraper(CanadianScraper):
             "RDA": "District",
         }
         organizations = {}
-        # Create list mapping names to IDs.
-        names_to_ids = {}
-        for division in Division.get("ocd-division/country:ca").children("csd"):
-            type_id = division.id.rsplit(":", 1)[1]
-            if type_id.startswith("59"):
-                if division.attrs["classification"] == "IRI":
-                    continue
-                if division.name in names_to_ids:
-                    names_to_ids[division.name] = None
-                else:
-                    names_to_ids[division.name] = division.id
+        districts = DistrictResolver(
+            (
+                division
+                for division in Division.get("ocd-division/country:ca").children("csd")
+                if division.id.rsplit(":", 1)[1].startswith("59") and division.attrs["classification"] != "IRI"
+            ),
+            corrections={
+                "100 Mile House": "One Hundred Mile House",
+            },
+            # Many subdivisions' names differ by a letter, e.g. "East Kootenay A" and "East Kootenay B".
+            max_distance=0,
+        )
 
         # Scrape list of municpalities.
         list_page = self.lxmlize(LIST_PAGE)
@@ -77,7 +76,6 @@ class BritishColumbiaMunicipalitiesPersonScraper(CanadianScraper):
 
             municipal_id = municipality.get("value")
             division_name = municipality_text.split(" (")[0]
-            division_name = division_corrections.get(division_name, division_name)
 
             record_url = LIST_PAGE + "?stext=&type=ss&lgid=" + municipal_id + "&agencyid=+"
 
@@ -86,8 +84,10 @@ class BritishColumbiaMunicipalitiesPersonScraper(CanadianScraper):
                 # Get division ID from municipal name and filter out duplicates or unknowns.
                 if division_name in exclude_districts or division_name in processed_divisions:
                     continue
-                division_id = names_to_ids[division_name]
-                if not isinstance(division_id, str):
+                try:
+                    division_id = districts.resolve(division_name).id
+                except LookupError as e:
+                    self.warning(str(e))
                     continue
                 if division_id in exclude_divisions:
                     continue
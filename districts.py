@@ -0,0 +1,144 @@
+"""
+Resolve district names, as written by sources, to divisions.
+
+A resolver normalizes the English and French names of a set of divisions once, ignoring accents, hyphens, lettercase
+and whitespace, so that an exact lookup is a dictionary lookup. Corrections for names that differ between a source and
+the divisions are merged into the same index. If a name has no exact match, a typo is tolerated: candidates that share
+enough trigrams with the name are compared by edit distance, within a bound.
+"""
+
+import logging
+import re
+from collections import Counter
+from functools import cache
+
+from unidecode import unidecode
+
+from divisions import Division
+
+TRANSLATION_TABLE = str.maketrans("\u2013\u2014-", "   ", "\u200f")  # n-dash, m-dash, right-to-left mark
+# Federal electoral district names used by sources, and the names of the divisions.
+CORRECTIONS = {
+    # Different names.
+    "Kelowna Lake Country": "Kelowna",
+    "Nonafot Nunavut": "Nunavut",
+    # Typographic errors.
+    "Northwest Territores": "Northwest Territories",
+}
+# The length of the n-grams in the fuzzy index.
+N = 3
+
+whitespace_re = re.compile(r"\s+")
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(name):
+    """Ignore accents, hyphens, lettercase, and leading, trailing and consecutive whitespace."""
+    return whitespace_re.sub(" ", unidecode(name.translate(TRANSLATION_TABLE)).title().strip())
+
+
+def ngrams(s):
+    padded = f"{' ' * (N - 1)}{s} "
+    return {padded[i : i + N] for i in range(len(padded) - N + 1)}
+
+
+def edit_distance(a, b, bound):
+    """Return the Levenshtein distance between two strings, or `bound + 1` if it exceeds the bound."""
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return min(previous[-1], bound + 1)
+
+
+class DistrictResolver:
+    """An index from the normalized names of divisions to the divisions."""
+
+    def __init__(self, divisions, corrections=None, max_distance=2):
+        """
+        :param divisions: the divisions to which to resolve names
+        :param corrections: a dict from a name used by a source to the name of a division
+        :param max_distance: the maximum number of typographic errors to tolerate
+        """
+        self.divisions = list(divisions)
+        self.max_distance = max_distance
+        self.names = {}
+        for division in self.divisions:
+            for name in (division.name, division.attrs.get("name_fr")):
+                if name:
+                    self.names.setdefault(normalize(name), {})[division] = None
+
+        for source_name, name in (corrections or {}).items():
+            key = normalize(name)
+            if key in self.names:
+                self.names[normalize(source_name)] = self.names[key]
+
+        self.keys = list(self.names)
+        self.ngrams = {}
+        for number, key in enumerate(self.keys):
+            for ngram in ngrams(key):
+                self.ngrams.setdefault(ngram, []).append(number)
+
+    def get(self, name):
+        """Return the division with the name, without tolerating typographic errors, or None."""
+        matches = self.names.get(normalize(name))
+        if matches and len(matches) == 1:
+            return next(iter(matches))
+        return None
+
+    def resolve(self, name):
+        """
+        Return the division with the name, tolerating typographic errors.
+
+        :raises LookupError: if no division, or more than one division, has the name
+        """
+        key = normalize(name)
+        matches = self.names.get(key)
+        if not matches:
+            matches = self.fuzzy_matches(key)
+            if len(matches) == 1:
+                logger.warning("Resolved district %r to %r", name, next(iter(matches)).name)
+        if not matches:
+            raise LookupError(f"No district matches {name!r}")
+        if len(matches) > 1:
+            raise LookupError(f"More than one district matches {name!r}: {', '.join(map(str, matches))}")
+        return next(iter(matches))
+
+    def fuzzy_matches(self, key):
+        """Return the divisions whose normalized names are nearest the normalized name, within the bound."""
+        # Don't tolerate as many errors in short names.
+        bound = min(self.max_distance, len(key) // 5)
+        query = ngrams(key)
+        # Each error changes at most N n-grams.
+        threshold = len(query) - N * bound
+        if not bound or threshold < 1:
+            return {}
+
+        counts = Counter(number for ngram in query for number in self.ngrams.get(ngram, ()))
+        best = bound + 1
+        matches = {}
+        for number, count in counts.items():
+            if count >= threshold:
+                distance = edit_distance(key, self.keys[number], best)
+                if distance < best:
+                    best = distance
+                    matches = dict(self.names[self.keys[number]])
+                elif distance == best <= bound:
+                    matches.update(self.names[self.keys[number]])
+        return matches
+
+
+@cache
+def federal_electoral_districts(year="2023"):
+    """Return the resolver for the federal electoral districts of a representation order."""
+    return DistrictResolver(
+        (division for division in Division.get("ocd-division/country:ca").children("ed") if year in division.id),
+        CORRECTIONS,
+    )
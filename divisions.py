@@ -0,0 +1,350 @@
+"""
+An indexed, memory-mapped store of OCD divisions.
+
+Parsing country-ca.csv into `opencivicdata.divisions.Division` objects takes a few hundred milliseconds and tens of
+megabytes in every process. Instead, the CSV is compiled once into a binary index next to it, which is memory-mapped,
+so that it loads in milliseconds and its pages are shared by concurrent processes. The index is rebuilt whenever the
+CSV's size or modification time changes.
+
+The index has:
+
+- a table of unique strings, and a hash table from a string to its number
+- a row per division, of the numbers of its column values, its type, its parent and its range of children
+- for the id, type, sgc, name and name_fr columns, the divisions with each value
+
+`Division` has the same interface as `opencivicdata.divisions.Division`, and adds lookups by type, SGC code and name.
+"""
+
+import csv
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import zlib
+from array import array
+
+MAGIC = b"OCDIDX1\0"
+# Columns that are indexed, in addition to the division type.
+INDEXED_COLUMNS = ("id", "sgc", "name", "name_fr")
+# Columns that are attributes of `Division`, rather than in `Division.attrs`.
+ATTRIBUTE_COLUMNS = ("id", "name", "sameAs", "validThrough")
+# A row's fields, after its columns' values.
+TYPE, PARENT, CHILDREN_START, CHILDREN_COUNT = range(4)
+NO_PARENT = 0xFFFFFFFF
+
+
+def index_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".idx"
+
+
+def build(csv_path):
+    """Return the index of a CSV of divisions, as bytes."""
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        rows = list(reader)
+
+    strings = {"": 0}
+
+    def intern(s):
+        number = strings.get(s)
+        if number is None:
+            number = strings[s] = len(strings)
+        return number
+
+    width = len(columns) + 4
+    id_column = columns.index("id")
+    records = array("I")
+    children = {}
+    numbers = {}
+    for i, row in enumerate(rows):
+        division_id = row[id_column]
+        parent_id, own_id = division_id.rsplit("/", 1)
+        # Like opencivicdata, link a division to its parent only if the parent is earlier in the CSV.
+        parent = numbers.get(parent_id, NO_PARENT)
+        if parent != NO_PARENT:
+            children.setdefault(parent, []).append(i)
+        numbers[division_id] = i
+        records.extend(intern(value) for value in row)
+        records.extend([intern(own_id.split(":")[0]), parent, 0, 0])
+
+    child_list = array("I")
+    for parent, indices in children.items():
+        records[parent * width + len(columns) + CHILDREN_START] = len(child_list)
+        records[parent * width + len(columns) + CHILDREN_COUNT] = len(indices)
+        child_list.extend(indices)
+
+    ordered = sorted(strings, key=strings.get)
+    blob = bytearray()
+    string_offsets = array("I")
+    for s in ordered:
+        string_offsets.append(len(blob))
+        blob += s.encode()
+    string_offsets.append(len(blob))
+
+    size = 1
+    while size < 2 * len(ordered):
+        size *= 2
+    string_table = array("I", [0]) * size
+    for number, s in enumerate(ordered):
+        slot = zlib.crc32(s.encode()) & (size - 1)
+        while string_table[slot]:
+            slot = (slot + 1) & (size - 1)
+        string_table[slot] = number + 1
+
+    sections = {
+        "records": records,
+        "children": child_list,
+        "string_offsets": string_offsets,
+        "string_table": string_table,
+    }
+    for name in (*INDEXED_COLUMNS, "type"):
+        field = len(columns) + TYPE if name == "type" else columns.index(name)
+        postings = {}
+        for i in range(len(rows)):
+            postings.setdefault(records[i * width + field], []).append(i)
+        starts = array("I", [0]) * (len(ordered) + 1)
+        entries = array("I")
+        for number in range(len(ordered)):
+            starts[number] = len(entries)
+            entries.extend(postings.get(number, ()))
+        starts[len(ordered)] = len(entries)
+        sections[f"{name}_starts"] = starts
+        sections[f"{name}_entries"] = entries
+
+    stat = os.stat(csv_path)
+    header = {
+        "source": [stat.st_size, stat.st_mtime_ns],
+        "columns": columns,
+        "count": len(rows),
+        "sections": {},
+    }
+    offset = 0
+    for name, values in sections.items():
+        header["sections"][name] = [offset, len(values)]
+        offset += len(values) * values.itemsize
+    header["blob"] = [offset, len(blob)]
+
+    encoded = json.dumps(header).encode()
+    encoded += b" " * (-(len(MAGIC) + 4 + len(encoded)) % 8)
+    body = b"".join(values.tobytes() for values in sections.values())
+    return MAGIC + struct.pack("<I", len(encoded)) + encoded + body + bytes(blob)
+
+
+class Index:
+    """A memory-mapped index of the divisions in a CSV."""
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.buffer = self.load()
+
+        (length,) = struct.unpack_from("<I", self.buffer, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(self.buffer[start : start + length]))
+        start += length
+
+        self.columns = header["columns"]
+        self.count = header["count"]
+        self.width = len(self.columns) + 4
+        view = memoryview(self.buffer)
+        for name, (offset, count) in header["sections"].items():
+            setattr(self, name, view[start + offset : start + offset + count * 4].cast("I"))
+        offset, length = header["blob"]
+        self.blob = view[start + offset : start + offset + length]
+        self.table_mask = len(self.string_table) - 1
+        self.column_numbers = {column: i for i, column in enumerate(self.columns)}
+
+    def load(self):
+        """Return the index's bytes, building the index if it is missing or stale."""
+        path = index_path(self.csv_path)
+        stat = os.stat(self.csv_path)
+        buffer = self.map(path)
+        if buffer is not None:
+            (length,) = struct.unpack_from("<I", buffer, len(MAGIC))
+            header = json.loads(buffer[len(MAGIC) + 4 : len(MAGIC) + 4 + length])
+            if header["source"] == [stat.st_size, stat.st_mtime_ns]:
+                return buffer
+            buffer.close()
+
+        data = build(self.csv_path)
+        try:
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as f:
+                f.write(data)
+            os.replace(f.name, path)
+        except OSError:
+            # The directory isn't writable. Use the index without saving it.
+            return data
+        return self.map(path) or data
+
+    def map(self, path):
+        """Memory-map an index file, or return None if it is missing or invalid."""
+        try:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if buffer[: len(MAGIC)] != MAGIC:
+            buffer.close()
+            return None
+        return buffer
+
+    def string(self, number):
+        return bytes(self.blob[self.string_offsets[number] : self.string_offsets[number + 1]]).decode()
+
+    def string_number(self, s):
+        """Return the number of a string, or None."""
+        encoded = s.encode()
+        slot = zlib.crc32(encoded) & self.table_mask
+        while True:
+            entry = self.string_table[slot]
+            if not entry:
+                return None
+            number = entry - 1
+            if self.blob[self.string_offsets[number] : self.string_offsets[number + 1]] == encoded:
+                return number
+            slot = (slot + 1) & self.table_mask
+
+    def lookup(self, name, value):
+        """Return the row numbers of the divisions whose `name` column (or type) is `value`."""
+        number = self.string_number(value)
+        if number is None:
+            return ()
+        starts = getattr(self, f"{name}_starts")
+        return getattr(self, f"{name}_entries")[starts[number] : starts[number + 1]]
+
+    def field(self, i, field):
+        return self.records[i * self.width + field]
+
+    def value(self, i, column):
+        return self.string(self.records[i * self.width + self.column_numbers[column]])
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_index(country, from_csv=None):
+    """Return the index for a country's divisions, from `from_csv` or the CSV that OCD_DIVISION_CSV names."""
+    if not from_csv:
+        if "OCD_DIVISION_CSV" not in os.environ:
+            raise ValueError("OCD_DIVISION_CSV is not set")
+        from_csv = os.environ["OCD_DIVISION_CSV"].format(country)
+    path = os.path.abspath(from_csv)
+    with _lock:
+        if path not in _indexes:
+            if not os.path.exists(path):
+                raise ValueError(f"Couldn't open CSV file {from_csv}")
+            _indexes[path] = Index(path)
+        return _indexes[path]
+
+
+class Division:
+    """A division in an index, with the interface of `opencivicdata.divisions.Division`."""
+
+    __slots__ = ("_index", "_number")
+
+    def __init__(self, index, number):
+        self._index = index
+        self._number = number
+
+    @classmethod
+    def all(cls, country, from_csv=None):
+        index = get_index(country, from_csv)
+        for number in range(index.count):
+            yield cls(index, number)
+
+    @classmethod
+    def get(cls, division, from_csv=None):
+        if not re.match(r"ocd-division/country:\w{2}", division):
+            raise ValueError("Invalid OCD format.")
+        index = get_index(re.findall(r"country:(\w{2})", division)[0], from_csv)
+        numbers = index.lookup("id", division)
+        if not numbers:
+            raise ValueError(f"Division not found: {division}")
+        # Like opencivicdata, the last division with a duplicate identifier wins.
+        return cls(index, numbers[-1])
+
+    @classmethod
+    def by_type(cls, country, _type, from_csv=None):
+        """Return the divisions of a type, like "province" or "csd", in CSV order."""
+        index = get_index(country, from_csv)
+        return [cls(index, number) for number in index.lookup("type", _type)]
+
+    @classmethod
+    def by_sgc(cls, country, sgc, from_csv=None):
+        """Return the divisions with a Standard Geographical Classification code, in CSV order."""
+        index = get_index(country, from_csv)
+        return [cls(index, number) for number in index.lookup("sgc", sgc)]
+
+    @classmethod
+    def by_name(cls, country, name, from_csv=None):
+        """Return the divisions with an English or French name, in CSV order."""
+        index = get_index(country, from_csv)
+        numbers = sorted({*index.lookup("name", name), *index.lookup("name_fr", name)})
+        return [cls(index, number) for number in numbers]
+
+    @property
+    def id(self):
+        return self._index.value(self._number, "id")
+
+    @property
+    def name(self):
+        return self._index.value(self._number, "name")
+
+    @property
+    def sameAs(self):  # noqa: N802 # opencivicdata
+        return self._index.value(self._number, "sameAs")
+
+    @property
+    def valid_through(self):
+        value = self._index.value(self._number, "validThrough")
+        if not value:
+            # Like opencivicdata, the attribute is set only if the column isn't empty.
+            raise AttributeError("valid_through")
+        return value
+
+    @property
+    def _type(self):
+        return self._index.string(self._index.field(self._number, len(self._index.columns) + TYPE))
+
+    @property
+    def attrs(self):
+        return {
+            column: self._index.value(self._number, column)
+            for column in self._index.columns
+            if column not in ATTRIBUTE_COLUMNS
+        }
+
+    @property
+    def parent(self):
+        parent = self._index.field(self._number, len(self._index.columns) + PARENT)
+        return None if parent == NO_PARENT else Division(self._index, parent)
+
+    def children(self, _type=None, duplicates=True, levels=1):  # noqa: FBT002 # opencivicdata
+        index = self._index
+        start = index.field(self._number, len(index.columns) + CHILDREN_START)
+        count = index.field(self._number, len(index.columns) + CHILDREN_COUNT)
+        type_number = index.string_number(_type) if _type else None
+        for number in index.children[start : start + count]:
+            d = Division(index, number)
+            if (not _type or index.field(number, len(index.columns) + TYPE) == type_number) and (
+                duplicates or not d.sameAs
+            ):
+                yield d
+                if levels > 1:
+                    yield from d.children(_type, duplicates, levels - 1)
+
+    def __eq__(self, other):
+        return isinstance(other, Division) and self._index is other._index and self._number == other._number
+
+    def __hash__(self):
+        return hash((id(self._index), self._number))
+
+    def __repr__(self):
+        return f"<Division {self.id}>"
+
+    def __str__(self):
+        return f"{self.id} - {self.name}"
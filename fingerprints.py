@@ -0,0 +1,87 @@
+import contextlib
+import glob
+import hashlib
+import json
+import os
+
+import requests
+from pupa import settings
+
+import transport
+from http_cache import HTTPCache
+
+# pupa deletes all JSON files in the data directory before scraping, so this file exists only after a successful run.
+FILENAME = "fingerprints.json"
+ROOT = os.path.abspath(os.path.dirname(__file__))
+# Files, other than a module's own, that affect a module's output.
+SHARED_FILES = ("country-ca.csv", "patch.py", "utils.py")
+
+
+def local_fingerprint(module_name):
+    """Return a hash of the code and data, other than remote sources, on which a module's output depends."""
+    paths = sorted(glob.glob(os.path.join(ROOT, module_name, "*.py")))
+    paths.extend(os.path.join(ROOT, path) for path in SHARED_FILES)
+
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def read(datadir):
+    """Return the fingerprints of a module's last successful run, or None."""
+    try:
+        with open(os.path.join(datadir, FILENAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write(datadir, fingerprints):
+    with open(os.path.join(datadir, FILENAME), "w") as f:
+        json.dump(fingerprints, f, indent=2, sort_keys=True)
+
+
+def remove(datadir):
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(os.path.join(datadir, FILENAME))
+
+
+def unchanged(module_name, datadir, *, imported=False):
+    """
+    Return whether a module's sources are unchanged since its last successful run.
+
+    Repeats each recorded request (through the HTTP cache, so that unchanged sources cost a conditional request) and
+    compares the response's status code and hash to the recorded ones. If `imported` is set, the last run must also
+    have imported the scraped data.
+    """
+    previous = read(datadir)
+    if not previous or (imported and not previous.get("imported")):
+        return False
+    if previous["local"] != local_fingerprint(module_name):
+        return False
+
+    cache = HTTPCache(os.path.join(settings.CACHE_DIR, "http")) if settings.CACHE_DIR else None
+    sessions = {"scraper": transport.session(), "cloudscrape": transport.cloudscraper_session()}
+    for request in previous["requests"]:
+        # The source can't be repeated, e.g. an FTP download or a failed connection.
+        if request["sha256"] is None:
+            return False
+
+        send = sessions[request["via"]].request
+        kwargs = {key: request[key] for key in ("params", "data", "json", "headers", "cookies", "verify")}
+        try:
+            if cache:
+                response = cache.request(send, request["method"], request["url"], timeout=60, **kwargs)
+            else:
+                response = send(request["method"], request["url"], timeout=60, **kwargs)
+        except requests.RequestException:
+            return False
+
+        if response.status_code != request["status_code"]:
+            return False
+        if hashlib.sha256(response.content).hexdigest() != request["sha256"]:
+            return False
+
+    return True
@@ -0,0 +1,210 @@
+"""
+Record a scrape's responses, and replay them without the network.
+
+If the `FIXTURES` environment variable is "record", scrapers make their requests as usual, but without the HTTP cache,
+and every response (its status, headers and body, including each redirect) is written to the module's archive,
+`<module>.zip` in `FIXTURES_DIR`. If it is "replay", every request is answered from the module's archive, without the
+network, the cache, throttling or backoff. A request that wasn't recorded raises `MissingFixture`.
+
+Responses are recorded by the transport adapters of the scraper's sessions, below scrapelib, the scheduler and the
+HTTP cache, so that `get`, `post`, `cloudscrape`, `csv_reader` and everything built on them behave the same in both
+modes. Files read over FTP by `csv_reader` are recorded too. A request is matched by its method, URL and body. If a
+request is made more than once while recording, e.g. if retried, the last response is kept.
+
+The archive also records the number of objects of each type that the scrape saved, so that `invoke replay_fixtures`
+can report any difference.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from io import BytesIO
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from http_cache import WIRE_HEADERS
+
+RECORD = "record"
+REPLAY = "replay"
+# The directory of the archives, one per module.
+DIRECTORY = os.getenv("FIXTURES_DIR", os.path.join(os.path.abspath(os.path.dirname(__file__)), "fixtures"))
+# Increment if the format of the archive changes.
+VERSION = 1
+
+
+def mode():
+    """Return "record", "replay" or "", from the `FIXTURES` environment variable."""
+    value = os.getenv("FIXTURES", "")
+    if value not in {RECORD, REPLAY, ""}:
+        raise ValueError(f"FIXTURES must be {RECORD!r} or {REPLAY!r}, not {value!r}")
+    return value
+
+
+def archive_path(module_name):
+    return os.path.join(DIRECTORY, f"{module_name}.zip")
+
+
+def key(method, url, body=None):
+    """Return the key of a request."""
+    if body is None:
+        body = b""
+    elif isinstance(body, str):
+        body = body.encode()
+    return hashlib.sha256(b"\n".join([method.upper().encode(), url.encode(), body])).hexdigest()
+
+
+class MissingFixture(requests.ConnectionError):
+    """A request that isn't in the module's archive."""
+
+
+class Fixtures:
+    """
+    The recorded responses of a module.
+
+    If replaying, the archive's index is read on creation, and each body is read from the archive when requested.
+    """
+
+    def __init__(self, module_name, mode):
+        self.module_name = module_name
+        self.mode = mode
+        self.path = archive_path(module_name)
+        self.lock = threading.Lock()
+        # The number of objects of each type that the scrape saved.
+        self.objects = {}
+        # The metadata of each response, by key.
+        self.responses = {}
+        # The body of each response, by key, if recording.
+        self.bodies = {}
+        # The number of requests answered from the archive, and not found in the archive.
+        self.replayed = 0
+        self.missing = 0
+        self.archive = None
+
+        if mode == REPLAY:
+            try:
+                self.archive = ZipFile(self.path)
+            except FileNotFoundError:
+                raise MissingFixture(f"No fixtures for {module_name} at {self.path}: record them first") from None
+            index = json.loads(self.archive.read("index.json"))
+            if index["version"] != VERSION:
+                raise ValueError(f"{self.path} has version {index['version']}, not {VERSION}: record it again")
+            self.objects = index["objects"]
+            self.responses = index["responses"]
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    def mount(self, session):
+        """Record or replay the requests of a session, and return the session."""
+        for prefix, adapter in list(session.adapters.items()):
+            if self.replaying:
+                session.mount(prefix, ReplayAdapter(self))
+            else:
+                session.mount(prefix, RecordingAdapter(self, adapter))
+        return session
+
+    def record(self, method, url, body, *, status_code, reason, headers, content):
+        """Record a response to a request."""
+        with self.lock:
+            self.responses[key(method, url, body)] = {
+                "method": method.upper(),
+                "url": url,
+                "status_code": status_code,
+                "reason": reason,
+                "headers": headers,
+            }
+            self.bodies[key(method, url, body)] = content
+
+    def replay(self, method, url, body=None):
+        """Return the metadata and body of the response to a request."""
+        request_key = key(method, url, body)
+        with self.lock:
+            metadata = self.responses.get(request_key)
+            if metadata is None:
+                self.missing += 1
+                raise MissingFixture(f"No fixture for {method.upper()} {url} in {self.path}")
+            self.replayed += 1
+            return metadata, self.archive.read(f"bodies/{request_key}")
+
+    def close(self):
+        """Write the archive, if recording, or close it, if replaying."""
+        if self.replaying:
+            self.archive.close()
+            return
+        index = {
+            "version": VERSION,
+            "module": self.module_name,
+            "recorded_at": time.time(),
+            "objects": self.objects,
+            "responses": self.responses,
+        }
+        os.makedirs(DIRECTORY, exist_ok=True)
+        # Write to a temporary file, in case the process is interrupted.
+        with self.lock, ZipFile(f"{self.path}.tmp", "w", ZIP_DEFLATED) as archive:
+            archive.writestr("index.json", json.dumps(index, indent=2, sort_keys=True))
+            for request_key, content in self.bodies.items():
+                archive.writestr(f"bodies/{request_key}", content)
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+class RecordingAdapter(requests.adapters.BaseAdapter):
+    """A transport adapter that records the responses of another adapter."""
+
+    def __init__(self, fixtures, adapter):
+        super().__init__()
+        self.fixtures = fixtures
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        # Read the body, even if streamed. It is then iterated from memory.
+        content = response.content
+        if request.method == "HEAD":
+            # The body is empty, and the headers describe the resource, e.g. its Content-Length.
+            headers = dict(response.headers)
+        else:
+            # The body is recorded decoded.
+            headers = {k: v for k, v in response.headers.items() if k.lower() not in WIRE_HEADERS}
+            headers["Content-Length"] = str(len(content))
+        self.fixtures.record(
+            request.method,
+            request.url,
+            request.body,
+            status_code=response.status_code,
+            reason=response.reason,
+            headers=headers,
+            content=content,
+        )
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(requests.adapters.BaseAdapter):
+    """A transport adapter that answers requests from the recorded responses."""
+
+    def __init__(self, fixtures):
+        super().__init__()
+        self.fixtures = fixtures
+
+    def send(self, request, **kwargs):  # noqa: ARG002 # the request isn't sent
+        metadata, content = self.fixtures.replay(request.method, request.url, request.body)
+        response = requests.Response()
+        response.status_code = metadata["status_code"]
+        response.reason = metadata["reason"]
+        response.headers = CaseInsensitiveDict(metadata["headers"])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.raw = BytesIO(content)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
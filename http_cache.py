@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Headers that describe the body as sent over the wire, rather than as stored.
+WIRE_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class HTTPCache:
+    """
+    An on-disk cache of HTTP responses, keyed by method, URL and body.
+
+    A cached response is used as-is while it is younger than `max_age` seconds. Otherwise, it is revalidated with a
+    conditional request (using its ETag and Last-Modified headers), and a 304 response is served from disk.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def key(self, method, url, *, params=None, data=None, json=None):
+        """Return the cache key for a request."""
+        request = requests.Request(method.upper(), url, params=params, data=data, json=json).prepare()
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode()
+        return hashlib.sha256(b"\n".join([request.method.encode(), request.url.encode(), body])).hexdigest()
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key[:2], f"{key}.{extension}")
+
+    def get(self, key):
+        """Return the metadata of a cached response, or None."""
+        try:
+            with open(self.path(key, "json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, response, *, stream=False):
+        """Store a response, and return its metadata."""
+        os.makedirs(os.path.dirname(self.path(key, "body")), exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        with self._open(key, "body", "wb") as f:
+            for chunk in response.iter_content(chunk_size=65536) if stream else [response.content]:
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+
+        metadata = {
+            "url": response.url,
+            "status_code": response.status_code,
+            "reason": response.reason,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in WIRE_HEADERS},
+            "stored_at": time.time(),
+            "sha256": digest.hexdigest(),
+            "size": size,
+        }
+        self._write_metadata(key, metadata)
+        return metadata
+
+    def touch(self, key, metadata, response):
+        """Mark a cached response as revalidated, with any updated validators from a 304 response."""
+        headers = CaseInsensitiveDict(metadata["headers"])
+        for header in ("ETag", "Last-Modified", "Cache-Control", "Expires"):
+            if header in response.headers:
+                headers[header] = response.headers[header]
+        metadata["headers"] = dict(headers)
+        metadata["stored_at"] = time.time()
+        self._write_metadata(key, metadata)
+
+    def response(self, key, metadata, *, stream=False):
+        """Build a response from the cache."""
+        response = requests.Response()
+        response.url = metadata["url"]
+        response.status_code = metadata["status_code"]
+        response.reason = metadata["reason"]
+        response.headers = CaseInsensitiveDict(metadata["headers"])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.fromcache = True
+        response.sha256 = metadata["sha256"]
+        response.size = metadata.get("size")
+        response.revalidated = False
+        if stream:
+            response.raw = open(self.path(key, "body"), "rb")  # noqa: SIM115 # closed by response.close()
+        else:
+            with open(self.path(key, "body"), "rb") as f:
+                response._content = f.read()  # noqa: SLF001
+        return response
+
+    def request(self, send, method, url, *, max_age=0, **kwargs):
+        """
+        Make a request through the cache.
+
+        `send` is a callable like `requests.Session.request`. Only 200 responses are cached.
+        """
+        key = self.key(method, url, params=kwargs.get("params"), data=kwargs.get("data"), json=kwargs.get("json"))
+        metadata = self.get(key)
+
+        if metadata and os.path.exists(self.path(key, "body")):
+            if time.time() - metadata["stored_at"] < max_age:
+                return self.response(key, metadata, stream=kwargs.get("stream"))
+
+            cached_headers = CaseInsensitiveDict(metadata["headers"])
+            headers = {}
+            if "ETag" in cached_headers:
+                headers["If-None-Match"] = cached_headers["ETag"]
+            if "Last-Modified" in cached_headers:
+                headers["If-Modified-Since"] = cached_headers["Last-Modified"]
+            kwargs["headers"] = {**headers, **(kwargs.get("headers") or {})}
+        else:
+            metadata = None
+
+        response = send(method, url, **kwargs)
+
+        if response.status_code == 304 and metadata:
+            self.touch(key, metadata, response)
+            response = self.response(key, metadata, stream=kwargs.get("stream"))
+            response.revalidated = True
+            return response
+        if response.status_code == 200:
+            metadata = self.set(key, response, stream=kwargs.get("stream"))
+            if kwargs.get("stream"):
+                # The body was consumed while writing it to disk.
+                response = self.response(key, metadata, stream=True)
+            response.fromcache = False
+        return response
+
+    def _write_metadata(self, key, metadata):
+        with self._open(key, "json", "w") as f:
+            json.dump(metadata, f)
+
+    def _open(self, key, extension, mode):
+        return _AtomicFile(self.path(key, extension), mode)
+
+
+class _AtomicFile:
+    """Write to a temporary file, and move it into place on success, in case other processes read the cache."""
+
+    def __init__(self, path, mode):
+        self.path = path
+        self.file = tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(path), delete=False)  # noqa: SIM115
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.file.name, self.path)
+        else:
+            os.unlink(self.file.name)
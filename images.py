@@ -0,0 +1,118 @@
+"""
+Tell photos from placeholder images, like generic silhouettes, without downloading every image.
+
+A scraper registers the SHA-1 hashes of its source's placeholder images. An image can only be a placeholder if its
+length is a placeholder's length, so an image is probed with a HEAD request, and is downloaded and hashed only if its
+length matches, or if a placeholder's length isn't yet known. Placeholders' lengths are learned as they are hashed.
+
+What is learned about an image is cached in `CACHE_DIR`, with its ETag and Last-Modified headers, so that an
+unchanged image isn't downloaded again.
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+
+from pupa import settings
+
+FILENAME = "images.json"
+# Increment if the format of an entry changes.
+VERSION = 1
+
+
+def cache_path():
+    return os.path.join(settings.CACHE_DIR, FILENAME) if settings.CACHE_DIR else None
+
+
+def entry(response, sha1=None):
+    """Return what is known about an image from a response to a HEAD or GET request."""
+    length = response.headers.get("Content-Length")
+    # The length of an encoded response isn't the length of the image.
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        length = None
+    return {
+        "status_code": response.status_code,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "length": int(length) if length and length.isdigit() else None,
+        "sha1": sha1,
+    }
+
+
+def unchanged(old, new):
+    """Return whether a HEAD response's entry describes the same image as a cached entry."""
+    if old["length"] != new["length"]:
+        return False
+    if new["etag"]:
+        return old["etag"] == new["etag"]
+    if new["last_modified"]:
+        return old["last_modified"] == new["last_modified"]
+    return False
+
+
+class ImageCache:
+    """
+    A cache of what is known about images, by URL, and of the lengths of placeholder images, by SHA-1 hash.
+
+    If `path` is None, the cache is kept in memory only.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.images = {}
+        self.lengths = {}
+        self.changed = False
+        self.lock = threading.Lock()
+        if path:
+            with contextlib.suppress(OSError, ValueError), open(path) as f:
+                data = json.load(f)
+                if data.get("version") == VERSION:
+                    self.images = data["images"]
+                    self.lengths = data["lengths"]
+
+    def get(self, url):
+        return self.images.get(url)
+
+    def set(self, url, entry):
+        with self.lock:
+            self.images[url] = entry
+            self.changed = True
+
+    def learn(self, entry, placeholders):
+        """Record the length of a placeholder image, if the entry is for one."""
+        if entry["sha1"] in placeholders and entry["length"] is not None:
+            with self.lock:
+                if self.lengths.get(entry["sha1"]) != entry["length"]:
+                    self.lengths[entry["sha1"]] = entry["length"]
+                    self.changed = True
+
+    def is_placeholder(self, entry, placeholders):
+        """
+        Return whether an image is a placeholder, or None if it must be hashed to tell.
+
+        :param entry: what is known about the image
+        :param placeholders: the SHA-1 hashes of placeholder images
+        """
+        if entry["sha1"]:
+            return entry["sha1"] in placeholders
+        if not placeholders:
+            return False
+        if entry["length"] is None or any(sha1 not in self.lengths for sha1 in placeholders):
+            return None
+        if entry["length"] in {self.lengths[sha1] for sha1 in placeholders}:
+            return None
+        return False
+
+    def save(self):
+        """Write the cache to disk, if it changed."""
+        if not self.path or not self.changed:
+            return
+        with contextlib.suppress(OSError):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Write atomically, in case other processes are reading the cache.
+            with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(self.path), delete=False) as f:
+                json.dump({"version": VERSION, "images": self.images, "lengths": self.lengths}, f)
+            os.replace(f.name, self.path)
+        self.changed = False
@@ -0,0 +1,177 @@
+"""
+Read the metadata of modules' person scrapers without importing them.
+
+Importing a scraper imports `utils`, which fetches spreadsheets and imports heavy dependencies. Tasks that only need a
+scraper's class attributes or module constants instead read them from the module's syntax tree. The metadata is cached
+in a manifest, in which a module's entry is reused until its people.py's size or modification time changes.
+
+A module's entry has:
+
+- `class_name`: the name of the person scraper class, or None if the module has none
+- `base`: the name of the class's first base class
+- `constants`: the module's constants, like `COUNCIL_PAGE`
+- `attributes`: the attributes and methods defined in the class body
+- `sources`: the source code of the methods
+- `host`: the host of the first URL in the module
+
+Values other than literals and `date(...)` calls with literal arguments are `None`.
+"""
+
+import ast
+import contextlib
+import json
+import os
+import tempfile
+from datetime import date
+from urllib.parse import urlsplit
+
+from pupa import settings
+
+FILENAME = "manifest.json"
+ROOT = os.path.abspath(os.path.dirname(__file__))
+# Increment if the format of an entry changes.
+VERSION = 1
+
+
+def cache_path():
+    return os.path.join(settings.CACHE_DIR, FILENAME) if settings.CACHE_DIR else None
+
+
+def evaluate(node):
+    """Return the value of an expression, or None if it can't be determined statically."""
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "date" and not node.keywords:
+        with contextlib.suppress(ValueError, TypeError):
+            return date(*(ast.literal_eval(arg) for arg in node.args))
+        return None
+    with contextlib.suppress(ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return ast.literal_eval(node)
+    return None
+
+
+def assignments(body):
+    """Yield the name and value of each assignment to a name in a block."""
+    for node in body:
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    yield target.id, node.value
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            yield node.target.id, node.value
+
+
+def extract(path):
+    """Return the metadata of the person scraper in a people.py file."""
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+
+    host = None
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Constant)
+            and isinstance(node.value, str)
+            and node.value.startswith(("http:", "https:"))
+        ):
+            host = urlsplit(node.value).hostname
+            break
+
+    klass = next(
+        (node for node in tree.body if isinstance(node, ast.ClassDef) and "PersonScraper" in node.name),
+        None,
+    )
+    body = klass.body if klass else []
+
+    attributes = {name: evaluate(value) for name, value in assignments(body) if value is not None}
+    sources = {}
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            attributes[node.name] = None
+            # Like `inspect.getsource`, include decorators and whole lines.
+            start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+            sources[node.name] = "".join(lines[start - 1 : node.end_lineno])
+
+    base = klass.bases[0] if klass and klass.bases else None
+    return {
+        "class_name": klass.name if klass else None,
+        "base": base.id if isinstance(base, ast.Name) else base.attr if isinstance(base, ast.Attribute) else None,
+        "constants": {name: evaluate(value) for name, value in assignments(tree.body) if name.isupper()},
+        "attributes": attributes,
+        "sources": sources,
+        "host": host,
+    }
+
+
+def encode(value):
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    # Sets are stored as sorted lists, e.g. hashes of placeholder images.
+    if isinstance(value, (set, frozenset)):
+        try:
+            return sorted(value)
+        except TypeError:  # e.g. a mix of strings and numbers
+            return sorted(value, key=repr)
+    # Other literals that JSON can't represent, like bytes and complex numbers, are stored as None.
+    return None
+
+
+def decode(value):
+    if value.keys() == {"__date__"}:
+        return date.fromisoformat(value["__date__"])
+    return value
+
+
+def write(path, entries):
+    """
+    Write the manifest atomically, in case other processes are reading it.
+
+    The manifest is only a cache, so a failure to write it is ignored. The temporary file is removed on any failure.
+    """
+    f = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), delete=False, encoding="utf-8") as f:
+            json.dump({"version": VERSION, "modules": entries}, f, default=encode, sort_keys=True)
+        os.replace(f.name, path)
+    except BaseException as e:
+        if f is not None:
+            with contextlib.suppress(OSError):
+                os.unlink(f.name)
+        if not isinstance(e, (OSError, TypeError, ValueError)):
+            raise
+
+
+def load(module_names, path=None):
+    """
+    Return a dict from each module name to its person scraper's metadata, updating the manifest if needed.
+
+    :param module_names: the modules' names
+    :param path: the manifest's path, by default in pupa's cache directory
+    """
+    path = path or cache_path()
+    manifest = {}
+    if path:
+        with contextlib.suppress(OSError, ValueError), open(path, encoding="utf-8") as f:
+            manifest = json.load(f, object_hook=decode)
+        if manifest.get("version") != VERSION:
+            manifest = {}
+    cached = manifest.get("modules", {})
+
+    changed = False
+    modules = {}
+    entries = dict(cached)
+    for module_name in module_names:
+        people = os.path.join(ROOT, module_name, "people.py")
+        stat = os.stat(people)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        entry = cached.get(module_name)
+        if not entry or entry["stamp"] != stamp:
+            entry = {"stamp": stamp, "metadata": extract(people)}
+            changed = True
+        entries[module_name] = entry
+        modules[module_name] = entry["metadata"]
+
+    if path and changed:
+        write(path, entries)
+
+    return modules
@@ -1,6 +1,9 @@
+from collections import defaultdict
 from copy import deepcopy
+from itertools import islice
 
 import regex as re
+from pupa.exceptions import ScrapeValueError
 from pupa.scrape.schemas.common import contact_details as _contact_details
 from pupa.scrape.schemas.common import links as _links
 from pupa.scrape.schemas.common import sources as _sources
@@ -8,6 +11,9 @@ from pupa.scrape.schemas.membership import schema as membership_schema
 from pupa.scrape.schemas.organization import schema as organization_schema
 from pupa.scrape.schemas.person import schema as person_schema
 from pupa.utils import DatetimeValidator
+from validictory.validator import SchemaValidator
+
+import phone
 
 # contact_details[].type must not be blank.
 _contact_details["items"]["properties"]["type"]["blank"] = False
@@ -24,10 +30,10 @@ _contact_details["items"]["properties"]["value"]["blank"] = False
 # Validate the format of contact_details[].value if contact_details[].type is an email address or telephone number.
 _contact_details["items"]["properties"]["value"]["conditionalPattern"] = [
     (
-        r"\A([A-Za-z0-9._\'+-]+)@(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,}\Z",
+        re.compile(r"\A([A-Za-z0-9._\'+-]+)@(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,}\Z"),
         lambda x: x["type"] == "email",
     ),  # accounts for + in email addresses
-    (r"\A1 \d{3} \d{3}-\d{4}(?: x\d+)?\Z", lambda x: x["type"] in ("text", "voice", "fax", "cell", "video", "pager")),
+    (phone.clean_re, lambda x: x["type"] in ("text", "voice", "fax", "cell", "video", "pager")),
 ]
 # Validate the format of contact_details[].note.
 _contact_details["items"]["properties"]["note"]["pattern"] = (
@@ -73,12 +79,18 @@ matchers = [
     (1, lambda x: x["type"] == "email", "Membership has many emails"),
 ]
 
+
+def same_type_and_note(type, note):
+    def matcher(x):
+        return x["type"] == type and x["note"] == note
+
+    # validate_maxMatchingItems counts contact details by type and note in one pass, instead of calling each matcher.
+    matcher.key = (type, note)
+    return matcher
+
+
 matchers.extend(
-    (
-        1,
-        lambda x, type=type, note=note: x["type"] == type and x["note"] == note,
-        "Membership has contact_details with same type and note",
-    )
+    (1, same_type_and_note(type, note), "Membership has contact_details with same type and note")
     for type in ("address", "cell", "fax", "voice")
     for note in ("constituency", "legislature", "office", "residence")
 )
@@ -159,8 +171,8 @@ def validate_conditionalPattern(self, x, fieldname, schema, path, arguments=None
     value = x.get(fieldname)
     if isinstance(value, str):
         for pattern, method in arguments:
-            if method(x) and not re.search(pattern, value):
-                self._error("does not match regular expression '{pattern}'", value, fieldname, pattern=pattern)
+            if method(x) and not pattern.search(value):
+                self._error("does not match regular expression '{pattern}'", value, fieldname, pattern=pattern.pattern)
 
 
 DatetimeValidator.validate_conditionalPattern = validate_conditionalPattern
@@ -169,13 +181,130 @@ DatetimeValidator.validate_conditionalPattern = validate_conditionalPattern
 def validate_maxMatchingItems(self, x, fieldname, schema, path, arguments=None):  # noqa: N802
     value = x.get(fieldname)
     if isinstance(value, list):
+        buckets = None
         for length, method, message in arguments:
-            count = 0
-            for v in value:
-                if method(v):
-                    count += 1
-                if count > length:
+            key = getattr(method, "key", None)
+            if key is None:
+                indices = (i for i, v in enumerate(value) if method(v))
+            else:
+                if buckets is None:
+                    buckets = defaultdict(list)
+                    for i, v in enumerate(value):
+                        buckets[v["type"], v["note"]].append(i)
+                indices = buckets.get(key, ())
+            # An error is reported for each item from the first matching item in excess of the length.
+            index = next(islice(indices, length, None), None)
+            if index is not None:
+                for _ in range(len(value) - index):
                     self._error(message, value, fieldname)
 
 
 DatetimeValidator.validate_maxMatchingItems = validate_maxMatchingItems
+
+validate_uncompiled = SchemaValidator._SchemaValidator__validate  # noqa: SLF001
+# (id(schema), validator options) => (schema, [(validate_* method, argument)]).
+compiled_schemas = {}
+
+
+def compile_schema(validator, schema):
+    """
+    Return the calls that validictory's __validate makes for a schema, in order.
+
+    The calls are the same, except that the ones for common keywords are specialized.
+    """
+    cls = type(validator)
+    newschema = dict(schema)
+    if validator.required_by_default and "required" not in schema:
+        newschema["required"] = validator.required_by_default
+    if not validator.blank_by_default and "blank" not in schema:
+        newschema["blank"] = validator.blank_by_default
+
+    calls = []
+    for schemaprop, argument in newschema.items():
+        method = getattr(cls, "validate_" + schemaprop, None)
+        if not method:
+            continue
+        if schemaprop == "blank":
+            if argument:
+                continue
+            method = validate_not_blank
+        elif schemaprop == "type" and isinstance(argument, str) and hasattr(cls, "validate_type_" + argument):
+            method = type_validator(getattr(cls, "validate_type_" + argument))
+        elif validator.disallow_unknown_properties or validator.remove_unknown_properties:
+            pass
+        elif schemaprop == "properties" and isinstance(argument, dict):
+            method = properties_validator(list(argument.items()))
+        elif schemaprop == "items" and isinstance(argument, dict):
+            method = validate_items
+        calls.append((method, argument))
+    return calls
+
+
+def type_validator(type_checker):
+    def validate_type(self, x, fieldname, schema, path, fieldtype):
+        if fieldname in x and not type_checker(self, x[fieldname]):
+            self._error("is not of type {fieldtype}", x[fieldname], fieldname, path=path, fieldtype=fieldtype)
+
+    return validate_type
+
+
+def properties_validator(properties):
+    def validate_properties(self, x, fieldname, schema, path, _):
+        value = x.get(fieldname)
+        if isinstance(value, dict):
+            for name, subschema in properties:
+                validate_compiled(self, name, value, subschema, path + "." + name)
+
+    return validate_properties
+
+
+def validate_items(self, x, fieldname, schema, path, items):
+    value = x.get(fieldname)
+    if isinstance(value, (list, tuple)):
+        for index, item in enumerate(value):
+            validate_compiled(self, "[list item]", {"[list item]": item}, items, f"{path}[{index}]")
+
+
+def validate_not_blank(self, x, fieldname, schema, path, blank):
+    value = x.get(fieldname)
+    if isinstance(value, str) and not value:
+        self._error("cannot be blank'", value, fieldname, path=path)
+
+
+def validate_compiled(self, fieldname, data, schema, path):
+    """Replace validictory's __validate, to look up the calls for a schema instead of rebuilding them each time."""
+    if not isinstance(schema, dict) or self.apply_default_to_data:
+        return validate_uncompiled(self, fieldname, data, schema, path)
+
+    key = (
+        id(schema),
+        self.required_by_default,
+        self.blank_by_default,
+        self.disallow_unknown_properties or self.remove_unknown_properties,
+    )
+    compiled = compiled_schemas.get(key)
+    # The identity check guards against a short-lived schema whose id is reused.
+    if compiled is None or compiled[0] is not schema:
+        compiled = compiled_schemas[key] = (schema, compile_schema(self, schema))
+
+    for method, argument in compiled[1]:
+        method(self, data, fieldname, schema, path, argument)
+    return data
+
+
+DatetimeValidator._SchemaValidator__validate = validate_compiled  # noqa: SLF001
+
+
+def validate_objects(objects):
+    """
+    Validate scraped objects in one batch, sharing the compiled schemas.
+
+    Return the errors that each object's `validate` method would raise.
+    """
+    errors = []
+    for obj in objects:
+        try:
+            obj.validate()
+        except ScrapeValueError as e:
+            errors.append(e)
+    return errors
@@ -0,0 +1,67 @@
+"""
+Find, clean and validate telephone numbers.
+
+The regular expressions are compiled once, and are shared by CanadianScraper.get_phone (extraction),
+CanadianPerson.clean_telephone_number (cleaning) and the conditionalPattern validator in patch.py (validation).
+"""
+
+import re
+from functools import cache, lru_cache
+
+# A telephone number, with an optional extension. Lookarounds, instead of consuming a non-digit on either side, allow
+# adjacent numbers to be found in one pass.
+PATTERN = r"(?<!\d)(\(?{area_code}\)?\D?\d{{3}}\D?\d{{4}}(?:\s*(?:/|x|ext[.:]?|poste)[\s-]?\d+)?)(?!\d)"
+
+phone_re = re.compile(PATTERN.format(area_code=r"\d{3}"))
+extension_re = re.compile(r"(?:\b \(|/|x|ext[.:]?|p\.?|poste)[\s-]?(?=\b|\d)", flags=re.IGNORECASE)
+non_digit_re = re.compile(r"\D")
+# The format of a clean telephone number.
+clean_re = re.compile(r"\A1 \d{3} \d{3}-\d{4}(?: x\d+)?\Z")
+
+
+@cache
+def area_codes_re(area_codes):
+    """Return a regular expression that matches a telephone number with any of the area codes."""
+    alternation = "|".join(f"(?P<_{area_code}>{area_code})" for area_code in area_codes)
+    return re.compile(PATTERN.format(area_code=f"(?:{alternation})"))
+
+
+def find(text, area_codes=()):
+    """
+    Return the first telephone number in the text, or None.
+
+    If area codes are given, return the first telephone number with the first area code that matches.
+    """
+    if not area_codes:
+        match = phone_re.search(text)
+        return match.group(1) if match else None
+
+    area_codes = tuple(str(area_code) for area_code in area_codes)
+    found = {}
+    for match in area_codes_re(area_codes).finditer(text):
+        name = next(name for name, value in match.groupdict().items() if value)
+        found.setdefault(name, match.group(1))
+    for area_code in area_codes:
+        if f"_{area_code}" in found:
+            return found[f"_{area_code}"]
+    return None
+
+
+# The same numbers recur across a council's people and pages.
+@lru_cache(maxsize=16384)
+def clean(s, area_code=None):
+    """Return the telephone number formatted like "1 613 555-0100 x123", or the string as-is if it can't be parsed."""
+    splits = extension_re.split(s)
+    digits = non_digit_re.sub("", splits[0])
+
+    if len(digits) == 7 and area_code:
+        digits = "1" + str(area_code) + digits
+    elif len(digits) == 10:
+        digits = "1" + digits
+
+    if len(digits) == 11 and digits[0] == "1" and len(splits) <= 2:
+        digits = f"{digits[0]} {digits[1:4]} {digits[4:7]}-{digits[7:]}"
+        if len(splits) == 2:
+            return "{} x{}".format(digits, splits[1].rstrip(")"))
+        return digits
+    return s
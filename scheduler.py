@@ -0,0 +1,221 @@
+"""
+Schedule requests politely, per host.
+
+All scrapers in a process share one scheduler, which keeps a token bucket per host, so that requests to different
+hosts don't wait on each other, and requests to a host shared by many scrapers, like docs.google.com, are limited
+together.
+
+The scheduler adapts to a host: a 429 or 503 response, or a connection error, slows all requests to the host, and a
+`Retry-After` header pauses them. The delay decays as requests succeed. A failed request is retried after a jittered,
+exponential backoff, but only while the host's retry budget lasts, so that a failing host isn't retried without end.
+
+The scheduler counts the requests, statuses, errors, retries and latency per host, in total and in a caller's own
+counters, e.g. a scraper's, if given.
+"""
+
+import email.utils
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+import requests
+
+# The number of requests that a host's bucket can hold, i.e. the number of requests that can be made at once after a
+# pause.
+BURST = 1
+# The statuses after which to retry a request and slow requests to the host.
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# The statuses after which to slow requests to the host.
+BACKOFF_STATUSES = {429, 503}
+# The minimum and maximum number of seconds to add between requests to a host that is failing.
+MIN_DELAY = 1
+MAX_DELAY = 60
+# The factor by which to multiply the added delay after each successful request.
+DELAY_DECAY = 0.9
+# The maximum number of seconds to honor in a Retry-After header. If longer, the request isn't retried.
+MAX_RETRY_AFTER = 300
+# The number of retries that a host's budget allows, plus a fraction of its requests.
+RETRY_BUDGET = 10
+RETRY_RATIO = 0.2
+
+
+def retry_after(response):
+    """Return the number of seconds in a response's Retry-After header, or None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class Counters:
+    """The counters of the requests to a host."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.retries_denied = 0
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.latency = 0
+        self.max_latency = 0
+        self.waited = 0
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "retries_denied": self.retries_denied,
+            "statuses": dict(self.statuses),
+            "errors": dict(self.errors),
+            "latency": round(self.latency, 3),
+            "mean_latency": round(self.latency / self.requests, 3) if self.requests else None,
+            "max_latency": round(self.max_latency, 3),
+            "waited": round(self.waited, 3),
+        }
+
+
+class Host(Counters):
+    """The state and counters of a host."""
+
+    def __init__(self):
+        super().__init__()
+        self.tokens = BURST
+        self.updated = time.monotonic()
+        # The time before which no request is started, e.g. from a Retry-After header.
+        self.not_before = 0
+        # The delay added between requests while the host is failing.
+        self.delay = 0
+
+
+class Scheduler:
+    def __init__(self):
+        self.hosts = defaultdict(Host)
+        self.lock = threading.Lock()
+
+    def counters(self, host, counters):
+        """Return the host's counters, and its counters in the caller's counters, if any."""
+        if counters is None:
+            return (self.hosts[host],)
+        return (self.hosts[host], counters[host])
+
+    def acquire(self, host, interval, counters=None):
+        """
+        Wait until a request to the host may start.
+
+        :param host: the host
+        :param interval: the minimum number of seconds between requests to the host, or 0
+        :param counters: the caller's counters, like `defaultdict(Counters)`, or None
+        """
+        with self.lock:
+            state = self.hosts[host]
+            now = time.monotonic()
+            interval = max(interval, state.delay)
+            if interval:
+                state.tokens = min(BURST, state.tokens + (now - state.updated) / interval)
+                state.updated = now
+                # A negative balance reserves the next tokens for requests that are already waiting.
+                state.tokens -= 1
+                wait = max(state.not_before - now, -state.tokens * interval, 0)
+            else:
+                wait = max(state.not_before - now, 0)
+            for counter in self.counters(host, counters):
+                counter.waited += wait
+        if wait:
+            time.sleep(wait)
+
+    def record(self, host, response, error, latency, counters=None):
+        """Count a request's outcome, and adapt the host's delay."""
+        with self.lock:
+            for counter in self.counters(host, counters):
+                counter.requests += 1
+                counter.latency += latency
+                counter.max_latency = max(counter.max_latency, latency)
+                if response is not None:
+                    counter.statuses[response.status_code] += 1
+                if error is not None and response is None:
+                    counter.errors[type(error).__name__] += 1
+
+            state = self.hosts[host]
+            if response is None or response.status_code in BACKOFF_STATUSES:
+                state.delay = min(max(state.delay * 2, MIN_DELAY), MAX_DELAY)
+                seconds = retry_after(response)
+                if seconds is not None:
+                    state.not_before = max(state.not_before, time.monotonic() + min(seconds, MAX_RETRY_AFTER))
+            elif response.status_code < 500:
+                state.delay *= DELAY_DECAY
+                if state.delay < MIN_DELAY / 10:
+                    state.delay = 0
+
+    def allow_retry(self, host, counters=None):
+        """Return whether the host's retry budget allows another retry, and count it."""
+        with self.lock:
+            state = self.hosts[host]
+            allowed = state.retries < RETRY_BUDGET + RETRY_RATIO * state.requests
+            for counter in self.counters(host, counters):
+                if allowed:
+                    counter.retries += 1
+                else:
+                    counter.retries_denied += 1
+            return allowed
+
+    def request(self, send, method, url, *, interval=0, retries=0, backoff=1, counters=None, **kwargs):
+        """
+        Make a request, once a request to its host may start, and retry it if it fails.
+
+        `send` is a callable like `requests.Session.request`. If it raises an error with a response, like an
+        `HTTPError`, the response's status decides whether to retry. The last error is raised.
+
+        :param interval: the minimum number of seconds between requests to the host, or 0
+        :param retries: the maximum number of times to retry the request
+        :param backoff: the number of seconds of the first backoff, which doubles with each retry
+        :param counters: the caller's counters, like `defaultdict(Counters)`, to count the request in, or None
+        """
+        host = urlsplit(url).hostname
+        attempt = 0
+        while True:
+            self.acquire(host, interval, counters)
+            start = time.monotonic()
+            response = error = None
+            try:
+                response = send(method, url, **kwargs)
+            except requests.exceptions.SSLError as e:
+                self.record(host, None, e, time.monotonic() - start, counters)
+                raise
+            except requests.RequestException as e:
+                response = e.response
+                error = e
+            self.record(host, response, error, time.monotonic() - start, counters)
+
+            retryable = response.status_code in RETRY_STATUSES if response is not None else True
+            seconds = retry_after(response)
+            if (
+                not retryable
+                or attempt >= retries
+                or (seconds is not None and seconds > MAX_RETRY_AFTER)
+                or not self.allow_retry(host, counters)
+            ):
+                if error:
+                    raise error
+                return response
+
+            attempt += 1
+            if seconds is None:
+                # "Full jitter": spread retries over the backoff, so that concurrent requests don't retry together.
+                time.sleep(random.uniform(0, backoff * 2 ** (attempt - 1)))  # noqa: S311 # non-cryptographic
+            # Otherwise, acquire() waits until the time in the Retry-After header.
+
+    def stats(self, counters=None):
+        """Return the counters of each host, in total or in the caller's counters."""
+        with self.lock:
+            hosts = self.hosts if counters is None else counters
+            return {host: counter.stats() for host, counter in sorted(hosts.items(), key=lambda item: str(item[0]))}
+
+
+scheduler = Scheduler()
@@ -0,0 +1,56 @@
+"""
+Read the sheets of a Google Sheets spreadsheet from one download of the spreadsheet.
+
+Scrapers read a sheet of a published spreadsheet as CSV, like `.../pub?gid=1105544164&single=true&output=csv`, with
+one request per sheet. Several modules read sheets of the same spreadsheet, and docs.google.com limits the rate of
+requests. If a scraper sets `read_whole_spreadsheet`, the whole spreadsheet is downloaded as XLSX instead, and the
+HTTP cache keeps the download for `SPREADSHEET_MAX_AGE` seconds, so that the other modules in a run read their sheets
+from it. A cell's value can be formatted differently than in the CSV export, e.g. a date or a number, so only
+scrapers whose sheets hold text opt in.
+
+An XLSX file has its sheets' titles, but not their gids. The gids' titles are read from the spreadsheet's HTML view,
+which is cached in the same way. If a gid's title isn't found, the sheet is read as CSV, as before.
+"""
+
+import os
+import re
+from urllib.parse import parse_qs, urlsplit
+
+# The number of seconds for which a downloaded spreadsheet is used without revalidation.
+SPREADSHEET_MAX_AGE = int(os.getenv("SPREADSHEET_MAX_AGE", "3600"))
+
+url_re = re.compile(r"\Ahttps://docs\.google\.com/spreadsheets/d/([\w-]+)/(pub|export)\Z")
+
+
+def parse_url(url):
+    """
+    Return the key of the spreadsheet, whether it is published, and the gid of the sheet of a sheet's CSV URL.
+
+    Return None if the URL isn't a sheet's CSV URL, or if it has no gid.
+    """
+    parts = urlsplit(url)
+    match = url_re.match(f"{parts.scheme}://{parts.netloc}{parts.path}")
+    query = parse_qs(parts.query)
+    if not match or query.get("output", query.get("format")) != ["csv"] or "gid" not in query:
+        return None
+    return match[1], match[2] == "pub", query["gid"][0]
+
+
+def workbook_url(key, published):
+    """Return the URL of the spreadsheet's XLSX export."""
+    if published:
+        return f"https://docs.google.com/spreadsheets/d/{key}/pub?output=xlsx"
+    return f"https://docs.google.com/spreadsheets/d/{key}/export?format=xlsx"
+
+
+def html_url(key, published):
+    """Return the URL of the spreadsheet's HTML view."""
+    return f"https://docs.google.com/spreadsheets/d/{key}/{'pubhtml' if published else 'htmlview'}"
+
+
+def sheet_titles(page):
+    """Return a dict from the gid to the title of each sheet in the spreadsheet's HTML view."""
+    return {
+        li.attrib["id"].removeprefix("sheet-button-"): li.text_content().strip()
+        for li in page.xpath('//li[starts-with(@id, "sheet-button-")]')
+    }
@@ -1,24 +1,43 @@
 import codecs
 import csv
+import gc
+import glob
 import importlib
+import json
 import os
 import re
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import date, timedelta
-from inspect import getsource
 from io import StringIO
 from urllib.parse import urlsplit
 
 import lxml.html
-import requests
 from invoke import task
-from opencivicdata.divisions import Division
+from invoke.exceptions import Exit
+from pupa import settings
 from unidecode import unidecode
 
+import fingerprints
+import fixtures
+import manifest
+import timings
+import transport
+from divisions import Division
+
 # Map Standard Geographical Classification codes to the OCD identifiers of provinces and territories.
 province_or_territory_abbreviation_memo = {}
-# Map OpenCivicData Division Identifier to Census type name.
-ocdid_to_type_name_map = {}
+# Map OCD division types ("cd" and "csd") to maps of census type codes to census type names.
+census_type_names_memo = {}
 ocd_division_csv = os.path.join(os.path.abspath(os.path.dirname(__file__)), "country-ca.csv")
+# The snapshot is written by `invoke update_census_types`.
+census_types_json = os.path.join(os.path.abspath(os.path.dirname(__file__)), "census_types.json")
+# Statistics Canada's tables of census division types (1.4) and census subdivision types (1.5).
+CENSUS_TYPES_URL = "https://www12.statcan.gc.ca/census-recensement/{year}/ref/dict/tab/t1_{table}-eng.cfm"
 
 
 def module_names():
@@ -36,9 +55,68 @@ def modules_and_module_names_and_classes():
         yield (module, module_name, module.__dict__[class_name])
 
 
+def jurisdiction(module_name):
+    """Return an instance of a module's jurisdiction, as `pupa update` does."""
+    module = importlib.import_module(module_name)
+    return next(
+        obj()
+        for obj in module.__dict__.values()
+        if isinstance(obj, type) and getattr(obj, "division_id", None) and getattr(obj, "classification", None)
+    )
+
+
+def run_module(module_name, args, timeout, *, skip_unchanged=False):
+    """
+    Run `pupa update` for a module in a subprocess, and return a summary of the run.
+
+    If `skip_unchanged` is set and the module's sources are unchanged since its last successful run, the previously
+    scraped data is kept, and the module isn't run.
+    """
+    start = time.time()
+    datadir = os.path.join(settings.SCRAPED_DATA_DIR, module_name)
+    imported = "--scrape" not in args
+
+    if skip_unchanged and fingerprints.unchanged(module_name, datadir, imported=imported):
+        return {"status": "unchanged", "returncode": None, "duration": round(time.time() - start, 3), "output": []}
+
+    try:
+        process = subprocess.run(  # noqa: S603
+            ["pupa", "update", *args, module_name],  # noqa: S607
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            timeout=timeout,
+            check=False,
+        )
+    except subprocess.TimeoutExpired as e:
+        status = "timeout"
+        returncode = None
+        output = e.output or b""
+    else:
+        status = "success" if process.returncode == 0 else "failure"
+        returncode = process.returncode
+        output = process.stdout
+
+    # The scraper writes fingerprints after scraping, but the import can still fail.
+    if status != "success":
+        fingerprints.remove(datadir)
+    elif imported:
+        module_fingerprints = fingerprints.read(datadir)
+        if module_fingerprints:
+            module_fingerprints["imported"] = True
+            fingerprints.write(datadir, module_fingerprints)
+
+    return {
+        "status": status,
+        "returncode": returncode,
+        "duration": round(time.time() - start, 3),
+        # The end of the output usually contains the error.
+        "output": output.decode("utf-8", errors="replace").splitlines()[-20:] if status != "success" else [],
+    }
+
+
 def csv_dict_reader(url, encoding="utf-8"):
     """Read a remote CSV file."""
-    response = requests.get(url)
+    response = transport.session().get(url)
     response.encoding = encoding
     return csv.DictReader(StringIO(response.text))
 
@@ -61,12 +139,16 @@ def slug(name):
     )
 
 
-def province_or_territory_abbreviation(code):
+def province_or_territory_abbreviations():
     if not province_or_territory_abbreviation_memo:
-        for division in Division.all("ca", from_csv=ocd_division_csv):
-            if division._type in ("province", "territory"):
+        for _type in ("province", "territory"):
+            for division in Division.by_type("ca", _type, from_csv=ocd_division_csv):
                 province_or_territory_abbreviation_memo[division.attrs["sgc"]] = type_id(division.id)
-    return province_or_territory_abbreviation_memo[type_id(code)[:2]]
+    return province_or_territory_abbreviation_memo
+
+
+def province_or_territory_abbreviation(code):
+    return province_or_territory_abbreviations()[type_id(code)[:2]]
 
 
 def type_id(id):
@@ -74,34 +156,38 @@ def type_id(id):
     return id.rsplit(":", 1)[1]
 
 
-def get_definition(division_id, *, aggregation=False):
-    """Return the expected configuration for a given division."""
-    if not ocdid_to_type_name_map:
-        # Map census division type codes to names.
-        census_division_type_names = {}
-        document = lxml.html.fromstring(
-            requests.get("https://www12.statcan.gc.ca/census-recensement/2016/ref/dict/tab/t1_4-eng.cfm").content
-        )
-        for text in document.xpath("//table//th[@headers]/text()"):
-            code, name = text.split(" – ", 1)
-            census_division_type_names[code] = name.split(" / ", 1)[0]
-
-        # Map census subdivision type codes to names.
-        census_subdivision_type_names = {}
-        document = lxml.html.fromstring(
-            requests.get("https://www12.statcan.gc.ca/census-recensement/2016/ref/dict/tab/t1_5-eng.cfm").content
-        )
-        for text in document.xpath("//table//th[@headers]/text()"):
-            code, name = text.split("\xa0– ", 1)
-            census_subdivision_type_names[code] = name.split(" / ", 1)[0]
+def census_type_names():
+    if not census_type_names_memo:
+        # Read the snapshot in this repository, or else Statistics Canada's tables.
+        if os.path.exists(census_types_json):
+            with open(census_types_json, encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = fetch_census_type_names()
+        census_type_names_memo.update(cd=data["cd"], csd=data["csd"])
+    return census_type_names_memo
+
+
+def fetch_census_type_names(year=2016):
+    """Return the census division and census subdivision type names in Statistics Canada's tables."""
+    data = {"year": int(year)}
+    for _type, table, separator in (("cd", 4, " – "), ("csd", 5, "\xa0– ")):
+        response = transport.session().get(CENSUS_TYPES_URL.format(year=year, table=table))
+        response.raise_for_status()
+        data[_type] = {}
+        for text in lxml.html.fromstring(response.content).xpath("//table//th[@headers]/text()"):
+            code, name = text.split(separator, 1)
+            data[_type][code] = name.split(" / ", 1)[0]
+    return data
 
-        # Map OCD identifiers to census types.
-        for division in Division.all("ca", from_csv=ocd_division_csv):
-            if division._type == "cd":
-                ocdid_to_type_name_map[division.id] = census_division_type_names[division.attrs["classification"]]
-            elif division._type == "csd":
-                ocdid_to_type_name_map[division.id] = census_subdivision_type_names[division.attrs["classification"]]
 
+def census_type_name(division):
+    """Return the name of a census division's or census subdivision's census type, like "City"."""
+    return census_type_names()[division._type][division.attrs["classification"]]
+
+
+def get_definition(division_id, *, aggregation=False):
+    """Return the expected configuration for a given division."""
     division = Division.get(division_id, from_csv=ocd_division_csv)
     ocd_type_id = type_id(division.id)
 
@@ -127,7 +213,7 @@ def get_definition(division_id, *, aggregation=False):
 
     elif division._type == "cd":
         expected["module_name"] = f"ca_{province_or_territory_abbreviation(division.id)}_{slug(division.name)}"
-        name_infix = ocdid_to_type_name_map[division.id]
+        name_infix = census_type_name(division)
         if name_infix == "Regional municipality":
             name_infix = "Regional"
         expected["name"] = f"{division.name} {name_infix} Council"
@@ -140,7 +226,7 @@ def get_definition(division_id, *, aggregation=False):
             else:
                 expected["name"] = f"Conseil municipal de {division.name}"
         else:
-            name_infix = ocdid_to_type_name_map[division.id]
+            name_infix = census_type_name(division)
             if name_infix in ("Municipality", "Specialized municipality"):
                 name_infix = "Municipal"
             elif name_infix == "District municipality":
@@ -183,12 +269,12 @@ def get_definition(division_id, *, aggregation=False):
 @task
 def council_pages():
     """Print scrapers' council page, or warns if it is missing or unneeded."""
-    for module, module_name, klass in modules_and_module_names_and_classes():
-        if klass.__bases__[0].__name__ == "CSVScraper":
-            if hasattr(module, "COUNCIL_PAGE"):
+    for module_name, metadata in manifest.load(module_names()).items():
+        if metadata["base"] == "CSVScraper":
+            if "COUNCIL_PAGE" in metadata["constants"]:
                 print(f"{module_name:<60} Delete COUNCIL_PAGE")
-        elif hasattr(module, "COUNCIL_PAGE"):
-            print(f"{module_name:<60} {module.COUNCIL_PAGE}")
+        elif "COUNCIL_PAGE" in metadata["constants"]:
+            print(f"{module_name:<60} {metadata['constants']['COUNCIL_PAGE']}")
         else:
             print(f"{module_name:<60} Missing COUNCIL_PAGE")
 
@@ -196,31 +282,30 @@ def council_pages():
 @task
 def csv_list():
     """List scrapers with CSV data."""
-    for _module, module_name, klass in modules_and_module_names_and_classes():
-        if hasattr(klass, "csv_url"):
-            print(f"{module_name}: {klass.csv_url}")
+    for module_name, metadata in manifest.load(module_names()).items():
+        if "csv_url" in metadata["attributes"]:
+            print(f"{module_name}: {metadata['attributes']['csv_url']}")
 
 
 @task
 def csv_stale():
     """List scrapers with stale manual CSV data."""
-    for _module, module_name, klass in modules_and_module_names_and_classes():
-        if hasattr(klass, "updated_at") and klass.updated_at < date.today() - timedelta(days=365):
-            print(f"{module_name}: Created on {klass.updated_at} by {klass.contact_person}")
+    for module_name, metadata in manifest.load(module_names()).items():
+        attributes = metadata["attributes"]
+        if "updated_at" in attributes and attributes["updated_at"] < date.today() - timedelta(days=365):
+            print(f"{module_name}: Created on {attributes['updated_at']} by {attributes['contact_person']}")
 
 
 @task
 def csv_error():
     """Note corrections that CSV publishers should make."""
-    for _module, module_name, klass in modules_and_module_names_and_classes():
-        if klass.__bases__[0].__name__ == "CSVScraper":
-            if "_candidates" in module_name and hasattr(klass, "updated_at"):
+    for module_name, metadata in manifest.load(module_names()).items():
+        if metadata["base"] == "CSVScraper":
+            attributes = metadata["attributes"]
+            if "_candidates" in module_name and "updated_at" in attributes:
                 continue
 
-            keys = klass.__dict__.keys() - {
-                # Internal keys.
-                "__module__",
-                "__doc__",
+            keys = attributes.keys() - {
                 # Acceptable configuration.
                 "csv_url",
                 "filename",
@@ -234,52 +319,58 @@ def csv_error():
                 "contact_person",
             }
 
-            if "encoding" in keys and klass.encoding in ("utf-8", "windows-1252"):
+            if "encoding" in keys and attributes["encoding"] in ("utf-8", "windows-1252"):
                 keys -= {"encoding"}
 
             if keys:
-                print(f"\n{module_name}\n{klass.csv_url}")
+                print(f"\n{module_name}\n{attributes['csv_url']}")
 
                 extra_keys = keys - {"corrections", "encoding", "header_converter"}
                 if extra_keys:
                     print("- Manually check the configuration of: {}".format(", ".join(extra_keys)))
 
                 if "encoding" in keys:
-                    print(f"- The CSV file should be encoded as 'utf-8' or 'windows-1252', not '{klass.encoding}'")
+                    print(
+                        f"- The CSV file should be encoded as 'utf-8' or 'windows-1252', not '{attributes['encoding']}'"
+                    )
 
                 if "corrections" in keys:
-                    for key, values in klass.corrections.items():
+                    for key, values in attributes["corrections"].items():
                         for actual, expected in values.items():
                             print(f"- Change '{actual}' to '{expected}' in {key}")
 
                 if "header_converter" in keys:
                     print("- Correct column headers according to:")
-                    print(getsource(klass.header_converter))
+                    print(metadata["sources"]["header_converter"])
+
+
+def tidy_definition(module_name):
+    """Return a module's jurisdiction's metadata and expected configuration."""
+    metadata = module_name_to_metadata(module_name)
+    expected = get_definition(metadata["division_id"], aggregation=bool(module_name.endswith("_municipalities")))
+    return metadata, expected
 
 
 @task
 def tidy():
     """Check that modules are configured correctly."""
-    # Map OCD identifiers to styles of address.
-    leader_styles = {}
-    member_styles = {}
-    for gid in range(3):
-        reader = csv_dict_reader(
-            f"https://docs.google.com/spreadsheets/d/11qUKd5bHeG5KIzXYERtVgs3hKcd9yuZlt-tCTLBFRpI/pub?single=true&gid={gid}&output=csv"
-        )
-        for row in reader:
-            key = row["Identifier"]
-            leader_styles[key] = row["Leader"]
-            member_styles[key] = row["Member"]
+    from utils import STYLES_OF_ADDRESS_SNAPSHOT, StylesOfAddress  # noqa: PLC0415 # utils is slow to import
 
-    division_ids = set()
-    jurisdiction_ids = set()
-    for module_name in module_names():
-        if module_name.endswith(("_candidates", "_municipalities")):
-            continue
+    # Map OCD identifiers to styles of address, from the snapshot in this repository, or else the cache or the
+    # spreadsheet.
+    if os.path.exists(STYLES_OF_ADDRESS_SNAPSHOT):
+        styles_of_address = StylesOfAddress().read_snapshot()
+    else:
+        styles_of_address = StylesOfAddress().load()
 
-        metadata = module_name_to_metadata(module_name)
+    module_names_to_check = [
+        module_name for module_name in module_names() if not module_name.endswith(("_candidates", "_municipalities"))
+    ]
+    definitions = map(tidy_definition, module_names_to_check)
 
+    division_ids = set()
+    jurisdiction_ids = set()
+    for module_name, (metadata, expected) in zip(module_names_to_check, definitions):
         # Ensure division_id is unique.
         division_id = metadata["division_id"]
         if division_id in division_ids:
@@ -294,12 +385,11 @@ def tidy():
         else:
             jurisdiction_ids.add(jurisdiction_id)
 
-        expected = get_definition(division_id, aggregation=bool(module_name.endswith("_municipalities")))
-
         # Ensure presence of url and styles of address.
-        if division_id not in member_styles:
+        style_of_address = styles_of_address.get(division_id, {})
+        if "Member" not in style_of_address:
             print(f"{module_name:<60} Missing member style of address: {division_id}")
-        if division_id not in leader_styles:
+        if "Leader" not in style_of_address:
             print(f"{module_name:<60} Missing leader style of address: {division_id}")
         url = metadata["url"]
         if url and not expected["url"]:
@@ -344,6 +434,252 @@ def tidy():
             print("{:<60} Expected {}".format(module_name, expected["module_name"]))
 
 
+@task
+def scrape_all(
+    workers=8,
+    per_host=2,
+    timeout=1800,
+    only="",
+    exclude="",
+    scrape_only=False,  # noqa: FBT002 # invoke
+    fastmode=False,  # noqa: FBT002 # invoke
+    skip_unchanged=False,  # noqa: FBT002 # invoke
+    report="scrape_all.json",
+):
+    """Run `pupa update` for all modules concurrently, and write a JSON summary of the runs."""
+    # Otherwise, no module would ever start.
+    if workers < 1:
+        raise Exit(f"--workers must be at least 1, not {workers}")
+    if per_host < 1:
+        raise Exit(f"--per-host must be at least 1, not {per_host}")
+
+    module_names_to_run = sorted(module_names())
+    if only:
+        module_names_to_run = [module_name for module_name in module_names_to_run if module_name in only.split(",")]
+    if exclude:
+        module_names_to_run = [
+            module_name for module_name in module_names_to_run if module_name not in exclude.split(",")
+        ]
+
+    args = []
+    if scrape_only:
+        args.append("--scrape")
+    if fastmode:
+        args.append("--fastmode")
+
+    hosts = {module_name: metadata["host"] for module_name, metadata in manifest.load(module_names_to_run).items()}
+    running_per_host = defaultdict(int)
+    pending = list(module_names_to_run)
+    running = {}
+    results = {}
+    start = time.time()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            # Start as many modules as there are free workers, without exceeding the per-host limit.
+            for module_name in list(pending):
+                if len(running) >= workers:
+                    break
+                host = hosts[module_name]
+                if host and running_per_host[host] >= per_host:
+                    continue
+                pending.remove(module_name)
+                running_per_host[host] += 1
+                running[executor.submit(run_module, module_name, args, timeout, skip_unchanged=skip_unchanged)] = (
+                    module_name
+                )
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                module_name = running.pop(future)
+                running_per_host[hosts[module_name]] -= 1
+                results[module_name] = {"host": hosts[module_name], **future.result()}
+                print(f"{module_name:<60} {results[module_name]['status']} {results[module_name]['duration']}s")
+
+    summary = {
+        "duration": round(time.time() - start, 3),
+        "success": sorted(k for k, v in results.items() if v["status"] == "success"),
+        "failure": sorted(k for k, v in results.items() if v["status"] == "failure"),
+        "timeout": sorted(k for k, v in results.items() if v["status"] == "timeout"),
+        "unchanged": sorted(k for k, v in results.items() if v["status"] == "unchanged"),
+        "modules": results,
+    }
+    with open(report, "w") as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+
+    print(
+        f"{len(summary['success'])} succeeded, {len(summary['failure'])} failed, {len(summary['timeout'])} timed out, "
+        f"{len(summary['unchanged'])} unchanged in {summary['duration']}s"
+    )
+
+
+@task
+def rank_timings(top=20, datadir=""):
+    """Rank the slowest modules and endpoints, from the timings written by the last scrape of each module."""
+    paths = glob.glob(os.path.join(datadir or settings.SCRAPED_DATA_DIR, "*", timings.FILENAME))
+    modules = []
+    endpoints = defaultdict(lambda: {"requests": 0, "seconds": 0, "bytes": 0, "modules": set()})
+    for path in paths:
+        for record in timings.read(path):
+            if record["type"] == "module":
+                modules.append(record)
+            elif record["type"] == "request" and record["cache"] != "hit":
+                endpoint = endpoints[(record["method"], record["url"])]
+                endpoint["requests"] += 1
+                endpoint["seconds"] += record["seconds"]
+                endpoint["bytes"] += record["bytes"] or 0
+                endpoint["modules"].add(record["module"])
+
+    top = int(top)
+    print(f"{'module':<50} {'seconds':>9} {'requests':>8} {'network':>9} {'parse':>9} {'MB':>7} {'errors':>6}")
+    for module in sorted(modules, key=lambda module: module["seconds"], reverse=True)[:top]:
+        print(
+            f"{module['module']:<50} {module['seconds']:>9.2f} {module['requests']:>8} "
+            f"{module['request_seconds']:>9.2f} {module['parse_seconds']:>9.2f} {module['bytes'] / 1e6:>7.2f} "
+            f"{module['errors']:>6}"
+        )
+
+    print(f"\n{'endpoint (excluding cache hits)':<80} {'seconds':>9} {'requests':>8} {'MB':>7} modules")
+    for (method, url), endpoint in sorted(endpoints.items(), key=lambda item: item[1]["seconds"], reverse=True)[:top]:
+        print(
+            f"{f'{method} {url}'[:80]:<80} {endpoint['seconds']:>9.2f} {endpoint['requests']:>8} "
+            f"{endpoint['bytes'] / 1e6:>7.2f} {', '.join(sorted(endpoint['modules']))}"
+        )
+
+
+@task
+def replay_fixtures(module="", allocations=True):  # noqa: FBT002 # invoke
+    """
+    Run the person scrapers of modules (all with fixtures, by default) against their recorded fixtures, and report the
+    wall time, the memory allocated and the objects saved.
+
+    Record fixtures by running `pupa update --scrape` with FIXTURES=record. The status is "changed" if the scrape
+    saved different numbers of objects than while recording. If tracing allocations, the times include its overhead.
+    """
+    os.environ["FIXTURES"] = fixtures.REPLAY
+    if module:
+        module_names_to_run = module.split(",")
+    else:
+        module_names_to_run = sorted(
+            module_name for module_name in module_names() if os.path.exists(fixtures.archive_path(module_name))
+        )
+
+    if allocations:
+        tracemalloc.start()
+    statuses = defaultdict(int)
+    print(f"{'module':<50} {'status':<20} {'seconds':>8} {'requests':>8} {'people':>6} {'objects':>7} {'peak MB':>8}")
+    for module_name in module_names_to_run:
+        replayed = 0
+        objects = {}
+        error = None
+        with tempfile.TemporaryDirectory() as datadir:
+            gc.collect()
+            if allocations:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            try:
+                juris = jurisdiction(module_name)
+                scraper = juris.scrapers["people"](juris, datadir)
+                try:
+                    objects = dict(scraper.do_scrape()["objects"])
+                finally:
+                    replayed = scraper.fixtures.replayed
+                status = "ok" if objects == scraper.fixtures.objects else "changed"
+            except Exception as e:
+                status = type(e).__name__
+                error = e
+            seconds = time.perf_counter() - start
+            peak = f"{(tracemalloc.get_traced_memory()[1] - baseline) / 1e6:>8.1f}" if allocations else f"{'':>8}"
+        statuses[status] += 1
+        print(
+            f"{module_name:<50} {status:<20} {seconds:>8.2f} {replayed:>8} {objects.get('person', 0):>6} "
+            f"{sum(objects.values()):>7} {peak}"
+        )
+        if status == "changed":
+            print(f"  expected {scraper.fixtures.objects}, got {objects}")
+        elif error:
+            print(f"  {error}")
+
+    print(", ".join(f"{count} {status}" for status, count in sorted(statuses.items())))
+
+
+@task
+def diff_benchmarks(before, after, threshold=5):
+    """
+    Compare two reports written by `python -m benchmarks.pipeline`, module by module and phase by phase.
+
+    Changes of more than `threshold` percent are marked with "+" (slower or larger) or "-" (faster or smaller).
+    """
+    with open(before) as f:
+        old = json.load(f)
+    with open(after) as f:
+        new = json.load(f)
+    threshold = float(threshold)
+
+    def change(a, b):
+        if a is None or b is None:
+            return f"{'':>17}"
+        percent = (b - a) / a * 100 if a else 0
+        mark = "+" if percent > threshold else "-" if percent < -threshold else " "
+        return f"{b - a:>+9.3f} {percent:>+6.1f}%{mark}"
+
+    def compare(label, a, b):
+        rows = [("seconds", a["seconds"], b["seconds"])]
+        rows.extend((phase, a["phases"].get(phase), b["phases"].get(phase)) for phase in b["phases"])
+        rows.append(
+            ("peak MB", a.get("peak_rss_mb", a.get("max_peak_rss_mb")), b.get("peak_rss_mb", b.get("max_peak_rss_mb")))
+        )
+        print(label)
+        for name, x, y in rows:
+            print(f"  {name:<10} {x if x is not None else '':>10} {y if y is not None else '':>10} {change(x, y)}")
+        if a.get("objects", {}) != b.get("objects", {}):
+            print(f"  objects changed from {a['objects']} to {b['objects']}")
+
+    print(f"before: {old['created_at']} {old['commit']}\nafter:  {new['created_at']} {new['commit']}\n")
+    for module_name in sorted(set(old["modules"]) | set(new["modules"])):
+        a = old["modules"].get(module_name)
+        b = new["modules"].get(module_name)
+        if not a or not b:
+            print(f"{module_name}: only in {'after' if b else 'before'}")
+        elif "error" in a or "error" in b:
+            print(f"{module_name}: {a.get('error', 'ok')} before, {b.get('error', 'ok')} after")
+        else:
+            compare(module_name, a, b)
+    compare("total", old["totals"], new["totals"])
+
+
+@task
+def update_styles_of_address():
+    """Update the snapshot of styles of address that is read if OFFLINE is set."""
+    from utils import (  # noqa: PLC0415 # utils is slow to import
+        STYLES_OF_ADDRESS_GIDS,
+        STYLES_OF_ADDRESS_SNAPSHOT,
+        STYLES_OF_ADDRESS_URL,
+        parse_styles_of_address,
+    )
+
+    styles_of_address = {}
+    for gid in STYLES_OF_ADDRESS_GIDS:
+        response = transport.session().get(STYLES_OF_ADDRESS_URL.format(gid))
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        styles_of_address.update(parse_styles_of_address(response.text))
+
+    with open(STYLES_OF_ADDRESS_SNAPSHOT, "w", encoding="utf-8") as f:
+        json.dump(styles_of_address, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+@task
+def update_census_types(year=2016):
+    """Update the snapshot of census division and census subdivision type names that `get_definition` reads."""
+    data = fetch_census_type_names(year)
+    with open(census_types_json, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
 @task
 def sources_and_assertions():
     """Check that sources are attributed and assertions are made."""
@@ -364,17 +700,12 @@ def sources_and_assertions():
 @task
 def validate_spreadsheet(url, identifier_header, geographic_name_header):
     """Validate the identifiers, geographic names and geographic types in a spreadsheet."""
-    sgc_to_id = {}
-
-    for division in Division.all("ca", from_csv=ocd_division_csv):
-        sgc_to_id[division.attrs["sgc"]] = division.id
-
     reader = csv_dict_reader(url)
     for row in reader:
         identifier = row[identifier_header]
 
         if len(identifier) == 2:
-            identifier = sgc_to_id[identifier]
+            identifier = Division.by_sgc("ca", identifier, from_csv=ocd_division_csv)[-1].id
         elif len(identifier) == 4:
             identifier = f"ocd-division/country:ca/cd:{identifier}"
         elif len(identifier) == 7:
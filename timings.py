@@ -0,0 +1,75 @@
+"""
+Record where a scrape's time goes.
+
+A scraper records each request's latency, size, status and use of the HTTP cache, and the time taken to parse each
+document. After a scrape, the records and the module's totals are written as JSON lines to `timings.jsonl` in the
+module's data directory, which `invoke rank_timings` reads. (pupa deletes only `*.json` files before a scrape.)
+
+A request's `cache` is "hit" if the cached response was used without a request, "revalidated" if the server confirmed
+that the cached response is current, "miss" if the response was fetched and stored, and null without a cache.
+"""
+
+import json
+import os
+from collections import Counter
+
+FILENAME = "timings.jsonl"
+
+
+def request_record(via, method, url, response, seconds, *, stream=False, error=None):
+    """Return the record of a request, which took `seconds` and returned the response, or raised the error."""
+    size = None
+    cache = None
+    if response is not None:
+        if getattr(response, "size", None) is not None:
+            size = response.size
+        elif not stream:
+            size = len(response.content)
+        elif response.headers.get("Content-Length", "").isdigit():
+            size = int(response.headers["Content-Length"])
+        if getattr(response, "fromcache", None) is not None:
+            cache = "miss" if not response.fromcache else "revalidated" if response.revalidated else "hit"
+    return {
+        "type": "request",
+        "via": via,
+        "method": method.upper(),
+        "url": url,
+        "status": response.status_code if response is not None else None,
+        "error": type(error).__name__ if error is not None and response is None else None,
+        "bytes": size,
+        "seconds": round(seconds, 4),
+        "cache": cache,
+    }
+
+
+def parse_record(url, kind, seconds, **extra):
+    """Return the record of parsing a document of a kind, like "html", "xml" or "csv", which took `seconds`."""
+    return {"type": "parse", "url": url, "kind": kind, "seconds": round(seconds, 4), **extra}
+
+
+def write(datadir, module_name, records, duration):
+    """Write a module's records, and the module's totals, to its data directory."""
+    requests = [record for record in records if record["type"] == "request"]
+    totals = {
+        "type": "module",
+        "module": module_name,
+        "seconds": round(duration, 4),
+        "requests": len(requests),
+        "bytes": sum(record["bytes"] or 0 for record in requests),
+        "request_seconds": round(sum(record["seconds"] for record in requests), 4),
+        "parse_seconds": round(sum(record["seconds"] for record in records if record["type"] == "parse"), 4),
+        "cache": dict(Counter(str(record["cache"]).lower() for record in requests)),
+        "errors": sum(1 for record in requests if record["error"] or (record["status"] or 0) >= 400),
+    }
+    with open(os.path.join(datadir, FILENAME), "w") as f:
+        for record in [*records, totals]:
+            f.write(json.dumps({"module": module_name, **record}, sort_keys=True))
+            f.write("\n")
+
+
+def read(path):
+    """Yield the records in a timings file."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,44 @@
+"""
+Share HTTP connections between requests.
+
+A requests session keeps a pool of connections to each host, but `requests.get` creates a new session, and so opens a
+new connection and makes a new TLS handshake, for every request. Code that makes requests outside a scraper uses the
+shared sessions in this module instead. Scrapers, whose sessions are their own, size their pools in the same way.
+
+The number of hosts whose pools are kept and the number of connections kept per host are set by the
+`HTTP_POOL_CONNECTIONS` and `HTTP_POOL_MAXSIZE` environment variables.
+"""
+
+import os
+from functools import cache
+
+import cloudscraper
+import requests
+
+# The number of hosts whose connection pools are kept open.
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "32"))
+# The number of connections kept open per host. Concurrent requests beyond this number open connections that are
+# closed after use.
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+
+
+def configure(session):
+    """Size the connection pools of a session's adapters, and return the session."""
+    for adapter in session.adapters.values():
+        # scrapelib also mounts an adapter for FTP.
+        if isinstance(adapter, requests.adapters.HTTPAdapter):
+            # cloudscraper's adapter overrides this method to keep its TLS settings.
+            adapter.init_poolmanager(POOL_CONNECTIONS, POOL_MAXSIZE)
+    return session
+
+
+@cache
+def session():
+    """Return the shared session."""
+    return configure(requests.Session())
+
+
+@cache
+def cloudscraper_session():
+    """Return the shared session for sites behind Cloudflare's anti-bot page."""
+    return configure(cloudscraper.create_scraper())
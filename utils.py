@@ -1,30 +1,55 @@
+import codecs
 import csv
+import hashlib
+import json
 import os
 import re
+import tempfile
+import time
 from collections import defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from ftplib import FTP
-from io import BytesIO, StringIO
+from functools import lru_cache, partial
+from io import BufferedReader, BytesIO, StringIO, TextIOWrapper
+from itertools import chain
+from string import Formatter
 from urllib.parse import unquote, urlparse
-from zipfile import ZipFile
+from zipfile import BadZipFile, ZipFile
 
 import agate
 import agateexcel  # noqa: F401
 import cloudscraper
 import lxml.html
+import openpyxl
 import requests
+import scrapelib
 from lxml import etree
-from opencivicdata.divisions import Division
+from pupa import settings
 from pupa.scrape import Jurisdiction, Organization, Person, Post, Scraper
+from pupa.utils import JSONEncoderPlus
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 
-import patch  # patch patches validictory # noqa: F401
+import arcgis
+import fingerprints
+import fixtures
+import images
+import patch  # patch patches validictory
+import phone
+import spreadsheets
+import timings
+import transport
+from divisions import Division
+from http_cache import HTTPCache
+from scheduler import Counters, scheduler
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
 CUSTOM_USER_AGENT = "Mozilla/5.0 (compatible; MSIE 10.0; Windows NT 6.1; Trident/6.0)"
 DEFAULT_USER_AGENT = requests.utils.default_user_agent()
-SCRAPER = cloudscraper.create_scraper()
+SCRAPER = transport.cloudscraper_session()
 
 CONTACT_DETAIL_TYPE_MAP = {
     "Address": "address",
@@ -86,48 +111,271 @@ CONTACT_DETAIL_NOTE_MAP = {
     "Work": "legislature",
 }
 SSL_VERIFY = "/usr/lib/ssl/certs/ca-certificates.crt" if os.getenv("SSL_VERIFY", "") else True
+# The normalized column names that CSVScraper reads.
+CSV_COLUMNS = {
+    "address line 1",
+    "address line 2",
+    "birth date",
+    "cell",
+    "district id",
+    "district name",
+    "email",
+    "facebook",
+    "fax",
+    "first name",
+    "gender",
+    "incumbent",
+    "last name",
+    "locality",
+    "name",
+    "party name",
+    "phone",
+    "photo url",
+    "postal code",
+    "primary role",
+    "province",
+    "source url",
+    "twitter",
+    "website",
+}
 
 email_re = re.compile(r"([A-Za-z0-9._-]+@(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,})")
 
 
-styles_of_address = {}
-for gid in range(3):
-    response = requests.get(
-        f"https://docs.google.com/spreadsheets/d/11qUKd5bHeG5KIzXYERtVgs3hKcd9yuZlt-tCTLBFRpI/pub?single=true&gid={gid}&output=csv",
-        verify=SSL_VERIFY,
-    )
-    if response.status_code == 200:
-        response.encoding = "utf-8"
-        for row in csv.DictReader(StringIO(response.text)):
-            identifier = row.pop("Identifier")
-            for field in list(row.keys()):
-                if not row[field] or field == "Name":
-                    row.pop(field)
-            if row:
-                styles_of_address[identifier] = row
+STYLES_OF_ADDRESS_URL = "https://docs.google.com/spreadsheets/d/11qUKd5bHeG5KIzXYERtVgs3hKcd9yuZlt-tCTLBFRpI/pub?single=true&gid={}&output=csv"
+STYLES_OF_ADDRESS_GIDS = range(3)
+# The snapshot is written by `invoke update_styles_of_address`.
+STYLES_OF_ADDRESS_SNAPSHOT = os.path.join(os.path.abspath(os.path.dirname(__file__)), "styles_of_address.json")
+# The number of seconds before the cached spreadsheet is revalidated.
+STYLES_OF_ADDRESS_TTL = int(os.getenv("STYLES_OF_ADDRESS_TTL", "86400"))
+# Read reference data from the snapshots in this repository instead of the network.
+OFFLINE = bool(os.getenv("OFFLINE", ""))
+# The number of bytes to read at a time from a streamed response.
+CHUNK_SIZE = 65536
+# The default number of seconds for which a cached HTTP response is used without revalidation.
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+
+
+def parse_styles_of_address(text):
+    """Return a dictionary of OCD division identifiers to styles of address, from the spreadsheet's CSV export."""
+    rows = {}
+    for row in csv.DictReader(StringIO(text)):
+        identifier = row.pop("Identifier")
+        for field in list(row.keys()):
+            if not row[field] or field == "Name":
+                row.pop(field)
+        if row:
+            rows[identifier] = row
+    return rows
+
+
+class StylesOfAddress(Mapping):
+    """
+    Map OCD division identifiers to styles of address, like `{"Leader": "Mayor", "Member": "Councillor"}`.
+
+    The spreadsheet is read on first access. It is cached in `CACHE_DIR` and revalidated with the server (using ETag
+    and Last-Modified headers) once the cache is older than `STYLES_OF_ADDRESS_TTL` seconds. If `OFFLINE` is set, the
+    snapshot in this repository is read instead, or the cache if there is no snapshot, or the spreadsheet if there is
+    neither. If the server is unreachable, a stale cache or the snapshot is read.
+    """
+
+    def __init__(self):
+        self._data = None
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self.load()
+        return self._data
+
+    @property
+    def cache_path(self):
+        return os.path.join(settings.CACHE_DIR, "styles_of_address.json")
+
+    def load(self):
+        cache = self.read_cache()
+        has_snapshot = os.path.exists(STYLES_OF_ADDRESS_SNAPSHOT)
+        if OFFLINE or fixtures.mode() == fixtures.REPLAY:
+            if has_snapshot:
+                return self.read_snapshot()
+            # Without the network, a cache of any age is better than nothing.
+            if cache["sheets"]:
+                return self.rows(cache)
+            # Without either, the spreadsheet is read from the network.
+            self.revalidate(cache)
+        elif time.time() - cache["checked_at"] >= STYLES_OF_ADDRESS_TTL:
+            self.revalidate(cache)
+
+        if cache["sheets"] or not has_snapshot:
+            return self.rows(cache)
+        return self.read_snapshot()
+
+    def read_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"checked_at": 0, "sheets": {}}
+
+    def rows(self, cache):
+        data = {}
+        for sheet in cache["sheets"].values():
+            data.update(sheet["rows"])
+        return data
+
+    def revalidate(self, cache):
+        """Update the cache in-place with any changed sheets, and write it to disk if all sheets are current."""
+        current = True
+        for gid in STYLES_OF_ADDRESS_GIDS:
+            sheet = cache["sheets"].get(str(gid), {})
+            headers = {}
+            if sheet.get("etag"):
+                headers["If-None-Match"] = sheet["etag"]
+            if sheet.get("last_modified"):
+                headers["If-Modified-Since"] = sheet["last_modified"]
+
+            try:
+                response = transport.session().get(
+                    STYLES_OF_ADDRESS_URL.format(gid), headers=headers, verify=SSL_VERIFY
+                )
+            except requests.RequestException:
+                current = False
+                continue
+
+            if response.status_code == 200:
+                response.encoding = "utf-8"
+                cache["sheets"][str(gid)] = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "rows": parse_styles_of_address(response.text),
+                }
+            elif response.status_code != 304:
+                current = False
+
+        if current:
+            cache["checked_at"] = time.time()
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            # Write atomically, in case other processes are reading the cache.
+            with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(self.cache_path), delete=False) as f:
+                json.dump(cache, f)
+            os.replace(f.name, self.cache_path)
+
+    def read_snapshot(self):
+        with open(STYLES_OF_ADDRESS_SNAPSHOT, encoding="utf-8") as f:
+            return json.load(f)
+
+
+styles_of_address = StylesOfAddress()
 
 
 class CanadianScraper(Scraper):
+    """The maximum number of concurrent requests made by `lxmlize_many`."""
+
+    max_workers = 4
+    """
+    The number of seconds for which a cached response is used without revalidation. Council pages change rarely, so
+    a scraper can set this to a day or more. If 0, every cached response is revalidated with a conditional request.
+    """
+    cache_max_age = HTTP_CACHE_MAX_AGE
+    """
+    Whether to validate the scraped objects in one batch after the scrape, instead of each as it is saved. The
+    errors are the same.
+    """
+    batch_validation = True
+    """
+    The SHA-1 hashes of the source's placeholder images, like generic silhouettes, for `has_photo`.
+    """
+    image_placeholders = ()
+    """
+    Whether `csv_reader` reads a sheet of a Google Sheets spreadsheet from a download of the whole spreadsheet, for
+    scrapers that read several sheets of the same spreadsheet. See the `spreadsheets` module. A cell's value can be
+    formatted differently than in the sheet's CSV export, e.g. a date or a number.
+    """
+    read_whole_spreadsheet = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        transport.configure(self)
+        # Responses recorded or replayed by the `fixtures` module, if the FIXTURES environment variable is set.
+        self.fixtures = None
+        if fixtures.mode():
+            self.fixtures = fixtures.Fixtures(self.jurisdiction.__module__, fixtures.mode())
+            self.fixtures.mount(self)
+        # cloudscraper's session is shared, unless its responses are recorded or replayed.
+        self.cloudscraper = (
+            self.fixtures.mount(transport.configure(cloudscraper.create_scraper())) if self.fixtures else SCRAPER
+        )
+        # The scheduler retries requests, with jittered backoff and within the host's retry budget, instead of scrapelib.
+        self.retries = self.retry_attempts
+        self.retry_attempts = 0
+        # Objects saved but not yet validated, if validating in batches.
+        self.unvalidated = []
+        self.http_cache = None
+        if settings.CACHE_DIR and not self.fixtures:
+            self.http_cache = HTTPCache(os.path.join(settings.CACHE_DIR, "http"))
+        # Hashes of the responses to the requests made during a scrape.
+        self.fingerprints = {}
+        # Timings of the requests made and documents parsed during a scrape.
+        self.timings = []
+        # The scheduler's counters of the requests made to each host during a scrape.
+        self.host_counters = defaultdict(Counters)
+        # Fixtures include every image probe, so that a replay doesn't depend on what is cached.
+        self.image_cache = images.ImageCache(None if self.fixtures else images.cache_path())
+        if self.fixtures:
+            # Every response is recorded or replayed, not read from a cache.
+            self.cache_storage = None
+        if self.http_cache:
+            # The HTTP cache replaces scrapelib's cache, which reads streamed responses into memory.
+            if not self.cache_write_only:  # pupa's --fastmode
+                self.cache_max_age = float("inf")
+            self.cache_storage = None
+
+    def xpath(self, node, expression, **variables):
+        """
+        Evaluate an XPath expression on a node, like `node.xpath(expression)`.
+
+        `node.xpath` compiles the expression at every call. This method compiles each expression once per process.
+        Values that vary, like search terms, should be passed as XPath variables, like `$substring`, rather than
+        formatted into the expression, so that the expression is compiled once.
+        """
+        return compile_xpath(expression)(node, **variables)
+
+    def cssselect(self, node, selector):
+        """
+        Return the elements that match a CSS selector, like `node.cssselect(selector)`, compiling each selector once
+        per process. Requires the cssselect package.
+        """
+        return compile_css(selector)(node)
+
     def get_email(self, node, expression=".", *, error=True):
         """
         Make sure that the node/expression is narrow enough to not capture a
         generic email address in the footer of the page, for example.
         """
         # If the text would be split across multiple sub-tags.
-        matches = [match.text_content() for match in node.xpath(f'{expression}//*[contains(text(), "@")]')]
+        matches = [match.text_content() for match in self.xpath(node, f'{expression}//*[contains(text(), "@")]')]
         # The text version is more likely to be correct, as it is more visible,
         # e.g. ca_bc has one `href` of `mailto:first.last.mla@leg.bc.ca`.
         matches.extend(
-            unquote(match.attrib["href"]) for match in node.xpath(f'{expression}//a[contains(@href, "mailto:")]')
+            unquote(match.attrib["href"]) for match in self.xpath(node, f'{expression}//a[contains(@href, "mailto:")]')
         )
         # Some emails are obfuscated by Cloudflare.
         matches.extend(
             self._cloudflare_decode(match)
-            for match in node.xpath(f'{expression}//@href[contains(., "cdn-cgi/l/email-protection")]')
+            for match in self.xpath(node, f'{expression}//@href[contains(., "cdn-cgi/l/email-protection")]')
         )
         # If the node has no sub-tags.
         if not matches:
-            matches = list(node.xpath(f'{expression}//text()[contains(., "@")]'))
+            matches = list(self.xpath(node, f'{expression}//text()[contains(., "@")]'))
         if matches:
             for match in matches:
                 match = email_re.search(match)
@@ -159,52 +407,266 @@ class CanadianScraper(Scraper):
         if area_codes is None:
             area_codes = []
         if isinstance(node, etree._ElementUnicodeResult):
-            match = re.search(
-                r"(?:\A|\D)(\(?\d{3}\)?\D?\d{3}\D?\d{4}(?:\s*(?:/|x|ext[.:]?|poste)[\s-]?\d+)?)(?:\D|\Z)", node
-            )
+            match = phone.find(node)
             if match:
-                return match.group(1)
-        match = node.xpath('.//a[contains(@href,"tel:")]')
+                return match
+        match = self.xpath(node, './/a[contains(@href, "tel:")]')
         if match:
             return match[0].attrib["href"].replace("tel:", "")
-        if area_codes:
-            for area_code in area_codes:
-                match = re.search(
-                    r"(?:\A|\D)(\(?%d\)?\D?\d{3}\D?\d{4}(?:\s*(?:/|x|ext[.:]?|poste)[\s-]?\d+)?)(?:\D|\Z)" % area_code,  # noqa: UP031
-                    node.text_content(),
-                )
-                if match:
-                    return match.group(1)
-        else:
-            match = re.search(
-                r"(?:\A|\D)(\(?\d{3}\)?\D?\d{3}\D?\d{4}(?:\s*(?:/|x|ext[.:]?|poste)[\s-]?\d+)?)(?:\D|\Z)",
-                node.text_content(),
-            )
-            if match:
-                return match.group(1)
+        match = phone.find(node.text_content(), area_codes)
+        if match:
+            return match
         if error:
             raise Exception(f"No phone pattern in {node.text_content()}")
         return None
 
     def get_link(self, node, substring, *, error=True):
-        match = node.xpath(f'.//a[contains(@href,"{substring}")]/@href')
+        match = self.xpath(node, ".//a[contains(@href, $substring)]/@href", substring=substring)
         if match:
             return match[0]
         if error:
             raise Exception(f"No link matching {substring}")
         return None
 
+    def has_photo(self, url):
+        """
+        Return whether the URL serves a photo, rather than an error or one of the `image_placeholders`.
+
+        The image is probed with a HEAD request, and downloaded only if it might be a placeholder and has changed since
+        it was last hashed. If the image was probed less than `cache_max_age` seconds ago, no request is made.
+        """
+        cached = self.image_cache.get(url)
+        if cached and time.time() - cached["checked_at"] < self.cache_max_age:
+            placeholder = self.image_cache.is_placeholder(cached, self.image_placeholders)
+            if placeholder is not None:
+                return cached["status_code"] == 200 and not placeholder
+
+        try:
+            # Bypass the HTTP cache, which doesn't store Content-Length headers.
+            entry = images.entry(self.scheduled_request("HEAD", url, verify=SSL_VERIFY, allow_redirects=True))
+        except scrapelib.HTTPError:  # e.g. 405 Method Not Allowed
+            entry = None
+
+        if entry and entry["status_code"] == 200:
+            if cached and cached["sha1"] and images.unchanged(cached, entry):
+                entry["sha1"] = cached["sha1"]
+            placeholder = self.image_cache.is_placeholder(entry, self.image_placeholders)
+        else:
+            placeholder = None
+
+        if placeholder is None:
+            response = self.get(url)
+            sha1 = hashlib.sha1(response.content).hexdigest() if response.status_code == 200 else None  # noqa: S324 # non-cryptographic
+            entry = images.entry(response, sha1)
+            entry["length"] = len(response.content)
+            self.image_cache.learn(entry, self.image_placeholders)
+            placeholder = sha1 in self.image_placeholders
+
+        entry["checked_at"] = time.time()
+        self.image_cache.set(url, entry)
+        return entry["status_code"] == 200 and not placeholder
+
     def get(self, *args, **kwargs):
         return super().get(*args, verify=kwargs.pop("verify", SSL_VERIFY), **kwargs)
 
     def post(self, *args, **kwargs):
         return super().post(*args, verify=kwargs.pop("verify", SSL_VERIFY), **kwargs)
 
+    def request(self, method, url, *, max_age=0, **kwargs):
+        """
+        :param max_age: the number of seconds for which a cached response is used without revalidation, if more than
+            the scraper's `cache_max_age`
+        """
+        start = time.perf_counter()
+        try:
+            if self.http_cache:
+                response = self.http_cache.request(
+                    self.scheduled_request, method, url, max_age=max(max_age, self.cache_max_age), **kwargs
+                )
+            else:
+                response = self.scheduled_request(method, url, **kwargs)
+        except scrapelib.HTTPError as e:
+            self.add_fingerprint("scraper", method, url, e.response, **kwargs)
+            self.add_timing("scraper", method, url, e.response, start, stream=kwargs.get("stream"))
+            raise
+        except requests.RequestException as e:
+            self.add_fingerprint("scraper", method, url, None, **kwargs)
+            self.add_timing("scraper", method, url, None, start, error=e)
+            raise
+        self.add_fingerprint("scraper", method, url, response, **kwargs)
+        self.add_timing("scraper", method, url, response, start, stream=kwargs.get("stream"))
+        return response
+
+    def scheduled_request(self, method, url, *, send=None, **kwargs):
+        """
+        Make a request through the scheduler, without the HTTP cache.
+
+        Requests to the same host are at least `60 / requests_per_minute` seconds apart, across all scrapers in the
+        process.
+
+        :param send: a callable like `requests.Session.request`, by default scrapelib's
+        """
+        if self.fixtures and self.fixtures.replaying:
+            # Replayed responses don't come from a host, so there is nothing to throttle, and a retry gets the same
+            # response.
+            return (send or super().request)(method, url, **kwargs)
+        return scheduler.request(
+            send or super().request,
+            method,
+            url,
+            interval=60 / self.requests_per_minute if self.requests_per_minute else 0,
+            retries=self.retries,
+            backoff=self.retry_wait_seconds,
+            counters=self.host_counters,
+            **kwargs,
+        )
+
+    def add_fingerprint(self, via, method, url, response, **kwargs):
+        """
+        Record the hash of a response, so that the runner can skip the scrape if no source has changed.
+
+        If the response is None, or if the request can't be repeated, the hash is None.
+        """
+        if response is None:
+            sha256 = None
+        elif getattr(response, "sha256", None):
+            sha256 = response.sha256
+        elif kwargs.get("stream"):
+            sha256 = None
+        else:
+            sha256 = hashlib.sha256(response.content).hexdigest()
+
+        fingerprint = {
+            "via": via,
+            "method": method.upper(),
+            "url": url,
+            "params": kwargs.get("params"),
+            "data": kwargs.get("data"),
+            "json": kwargs.get("json"),
+            # cloudscraper sets its own User-Agent.
+            "headers": {"User-Agent": self.user_agent, **(kwargs.get("headers") or {})} if via == "scraper" else None,
+            "cookies": kwargs.get("cookies"),
+            "verify": kwargs.get("verify", True),
+            "status_code": response.status_code if response is not None else None,
+            "sha256": sha256,
+        }
+        try:
+            key = json.dumps(fingerprint, sort_keys=True)
+        except TypeError:  # e.g. a cookie jar or a file
+            fingerprint = {key: value if isinstance(value, (str, int)) else None for key, value in fingerprint.items()}
+            fingerprint["sha256"] = None
+            key = json.dumps(fingerprint, sort_keys=True)
+        self.fingerprints[key] = fingerprint
+
+    def add_timing(self, via, method, url, response, start, *, stream=False, error=None):
+        """
+        Record the latency, size, status and cache use of a request.
+
+        :param start: the value of `time.perf_counter()` before the request
+        """
+        seconds = time.perf_counter() - start
+        self.timings.append(timings.request_record(via, method, url, response, seconds, stream=stream, error=error))
+
+    def add_parse_timing(self, url, kind, start, **extra):
+        """
+        Record the time taken to parse a document.
+
+        :param start: the value of `time.perf_counter()` before parsing
+        """
+        self.timings.append(timings.parse_record(url, kind, time.perf_counter() - start, **extra))
+
+    def save_object(self, obj):
+        """Save the object as pupa does, but defer its validation if validating in batches."""
+        if not self.batch_validation:
+            super().save_object(obj)
+            return
+
+        obj.pre_save(self.jurisdiction.jurisdiction_id)
+
+        filename = f"{obj._type}_{obj._id}.json".replace("/", "-")
+        self.info("save %s %s as %s", obj._type, obj, filename)
+        self.output_names[obj._type].add(filename)
+
+        with open(os.path.join(self.datadir, filename), "w") as f:
+            json.dump(obj.as_dict(), f, cls=JSONEncoderPlus)
+
+        self.unvalidated.append(obj)
+
+        for related in obj._related:
+            self.save_object(related)
+
+    def validate_objects(self):
+        """Validate the saved objects in one batch, and warn about or raise the errors, as pupa does."""
+        errors = patch.validate_objects(self.unvalidated)
+        self.unvalidated = []
+        for error in errors:
+            self.warning(error)
+        if errors and self.strict_validation:
+            raise errors[0]
+
+    def do_scrape(self, **kwargs):
+        self.fingerprints = {}
+        self.timings = []
+        self.host_counters = defaultdict(Counters)
+        self.unvalidated = []
+        start = time.perf_counter()
+        try:
+            record = super().do_scrape(**kwargs)
+            if self.fixtures and not self.fixtures.replaying:
+                self.fixtures.objects = dict(record["objects"])
+        finally:
+            if self.fixtures:
+                self.fixtures.close()
+            self.image_cache.save()
+            timings.write(self.datadir, self.jurisdiction.__module__, self.timings, time.perf_counter() - start)
+            for host, stats in scheduler.stats(self.host_counters).items():
+                self.info(
+                    "%s: %d requests (%s), %d errors, %d retries (%d denied), %.3fs mean latency, %.3fs waited",
+                    host,
+                    stats["requests"],
+                    ", ".join(f"{status}: {count}" for status, count in sorted(stats["statuses"].items())),
+                    sum(stats["errors"].values()),
+                    stats["retries"],
+                    stats["retries_denied"],
+                    stats["mean_latency"] or 0,
+                    stats["waited"],
+                )
+        self.validate_objects()
+        # Reached only if the scrape succeeded.
+        fingerprints.write(
+            self.datadir,
+            {
+                "local": fingerprints.local_fingerprint(self.jurisdiction.__module__),
+                "imported": False,
+                "requests": list(self.fingerprints.values()),
+            },
+        )
+        return record
+
     def cloudscrape(self, url, verify=SSL_VERIFY):
-        response = SCRAPER.get(url, verify=verify)
+        start = time.perf_counter()
+        try:
+            if self.http_cache:
+                response = self.http_cache.request(
+                    partial(self.scheduled_request, send=self.cloudscraper.request),
+                    "GET",
+                    url,
+                    max_age=self.cache_max_age,
+                    verify=verify,
+                )
+            else:
+                response = self.scheduled_request("GET", url, send=self.cloudscraper.request, verify=verify)
+        except requests.RequestException as e:
+            self.add_fingerprint("cloudscrape", "GET", url, None, verify=verify)
+            self.add_timing("cloudscrape", "GET", url, None, start, error=e)
+            raise
+        self.add_fingerprint("cloudscrape", "GET", url, response, verify=verify)
+        self.add_timing("cloudscrape", "GET", url, response, start)
         response.raise_for_status()
+        start = time.perf_counter()
         page = lxml.html.fromstring(response.content)
         page.make_links_absolute(url)
+        self.add_parse_timing(url, "html", start)
         return page
 
     def lxmlize(
@@ -214,10 +676,12 @@ class CanadianScraper(Scraper):
         # https://github.com/jamesturk/scrapelib/blob/5ce0916/scrapelib/__init__.py#L505
         self.user_agent = user_agent
 
-        response = self.get(url, cookies=cookies, verify=verify)
+        # Also set it on the request, in case another thread changes the session's header.
+        response = self.get(url, cookies=cookies, verify=verify, headers={"User-Agent": user_agent})
         if encoding:
             response.encoding = encoding
 
+        start = time.perf_counter()
         try:
             text = response.text
             if xml:
@@ -230,31 +694,104 @@ class CanadianScraper(Scraper):
 
         meta = page.xpath('//meta[@http-equiv="refresh"]')
         if meta:
+            self.add_parse_timing(url, "xml" if xml else "html", start)
             _, url = meta[0].attrib["content"].split("=", 1)
             return self.lxmlize(url, encoding)
         if xml:
+            self.add_parse_timing(url, "xml", start)
             return page
         page.make_links_absolute(url)
+        self.add_parse_timing(url, "html", start)
         return page
 
+    def lxmlize_many(self, urls, *, errors=(), **kwargs):
+        """
+        Fetch and parse pages concurrently, and return them in the same order as the URLs.
+
+        Accepts the same keyword arguments as `lxmlize`. Requests to the same host are still throttled by
+        `requests_per_minute`.
+
+        If a URL raises an exception of one of the types in `errors`, the exception is returned in place of its page.
+        """
+
+        def lxmlize(url):
+            try:
+                return self.lxmlize(url, **kwargs)
+            except errors as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lxmlize, urls))
+
+    def _throttle(self):
+        # The scheduler throttles requests per host, instead of scrapelib per scraper.
+        pass
+
+    def spreadsheet_lines(self, url):
+        """
+        Return an iterator of CSV lines of a Google Sheets sheet from a download of the whole spreadsheet, or None.
+
+        See the `spreadsheets` module. Return None if the URL isn't a sheet's CSV URL, or if the sheet isn't found.
+        """
+        parsed = spreadsheets.parse_url(url)
+        if not parsed:
+            return None
+        key, published, gid = parsed
+
+        try:
+            response = self.get(spreadsheets.html_url(key, published), max_age=spreadsheets.SPREADSHEET_MAX_AGE)
+            title = spreadsheets.sheet_titles(lxml.html.fromstring(response.content)).get(gid)
+            if title is None:
+                self.debug("No sheet %s in %s", gid, response.url)
+                return None
+            response = self.get(spreadsheets.workbook_url(key, published), max_age=spreadsheets.SPREADSHEET_MAX_AGE)
+        except (requests.RequestException, etree.ParserError) as e:
+            self.debug("Can't read %s from a download of the spreadsheet: %s", url, e)
+            return None
+
+        try:
+            workbook = openpyxl.load_workbook(BytesIO(response.content), read_only=True, data_only=True)
+        except BadZipFile:  # e.g. a sign-in page
+            self.debug("%s is not an XLSX file", response.url)
+            return None
+        if title not in workbook.sheetnames:
+            self.debug("No sheet %r in %s", title, response.url)
+            workbook.close()
+            return None
+        return iter_sheet_lines(workbook, workbook[title])
+
     def csv_reader(self, url, *, delimiter=",", header=False, encoding=None, skip_rows=0, data=None, **kwargs):
+        if not data and not kwargs and self.read_whole_spreadsheet:
+            data = self.spreadsheet_lines(url)
         if not data:
             result = urlparse(url)
             if result.scheme == "ftp":
-                data = StringIO()
-                ftp = FTP(result.hostname)  # noqa: S321
-                ftp.login(result.username, result.password)
-                ftp.retrbinary(f"RETR {result.path}", lambda block: data.write(block.decode("utf-8")))
-                ftp.quit()
-                data.seek(0)
+                start = time.perf_counter()
+                if self.fixtures and self.fixtures.replaying:
+                    _, content = self.fixtures.replay("GET", url)
+                else:
+                    buffer = BytesIO()
+                    ftp = FTP(result.hostname)  # noqa: S321
+                    ftp.login(result.username, result.password)
+                    ftp.retrbinary(f"RETR {result.path}", buffer.write)
+                    ftp.quit()
+                    content = buffer.getvalue()
+                    if self.fixtures:
+                        self.fixtures.record(
+                            "GET", url, None, status_code=200, reason="OK", headers={}, content=content
+                        )
+                self.add_fingerprint("ftp", "GET", url, None)
+                self.add_timing("ftp", "GET", url, None, start)
+                data = StringIO(content.decode("utf-8"))
             else:
-                response = self.get(url, **kwargs)
+                response = self.get(url, stream=True, **kwargs)
                 if encoding:
                     response.encoding = encoding
-                data = StringIO(response.text.strip().removeprefix("\ufeff"))  # BOM
+                data = iter_lines(response.iter_content(chunk_size=CHUNK_SIZE), response.encoding)
+        data = iter(data)
         if skip_rows:
             for _ in range(skip_rows):
-                data.readline()
+                next(data, None)
         if header:
             return csv.DictReader(data, delimiter=delimiter)
         return csv.reader(data, delimiter=delimiter)
@@ -283,6 +820,17 @@ class CSVScraper(CanadianScraper):
     If the CSV table starts with non-data rows, set the number of rows to skip.
     """
     skip_rows = 0
+    """
+    If `csv_url` is an ArcGIS Hub download, set the URL of its feature layer, like
+    'https://services1.arcgis.com/…/FeatureServer/0', to query the layer instead. Only the columns that the scraper
+    reads are queried. If the query fails, `csv_url` is read.
+    """
+    feature_layer_url = None
+    """
+    If `feature_layer_url` is set and the scraper reads other columns than the CSV schema's, e.g. in
+    `is_valid_row`, set their normalized names.
+    """
+    extra_columns = ()
 
     # Row flags
     """
@@ -378,170 +926,227 @@ class CSVScraper(CanadianScraper):
         return row["name"] not in empty
 
     def scrape(self):
+        # The time spent parsing and processing rows, excluding the time spent by the caller between people. As the
+        # body of a streamed response is read while parsing, its transfer is included.
+        start = time.perf_counter()
+        requests_made = len(self.timings)
+        seconds = 0
+        rows = 0
         seat_numbers = defaultdict(lambda: defaultdict(int))
 
+        delimiter = self.delimiter
+        skip_rows = self.skip_rows
         extension = self.extension if self.extension else os.path.splitext(self.csv_url)[1]
-        if extension in (".xls", ".xlsx"):
+        data = self.feature_layer_lines() if self.feature_layer_url else None
+        if data is not None:
+            # The lines are written by `arcgis.read_lines`, not read from `csv_url`.
+            delimiter = ","
+            skip_rows = 0
+        elif extension == ".xls":
             data = StringIO()
-            binary = BytesIO(self.get(self.csv_url).content)
-            if extension == ".xls":
-                table = agate.Table.from_xls(binary)
-            elif extension == ".xlsx":
-                table = agate.Table.from_xlsx(binary)
+            table = agate.Table.from_xls(BytesIO(self.get(self.csv_url).content))
             table.to_csv(data)
             data.seek(0)
+        elif extension == ".xlsx":
+            data = iter_xlsx_lines(self.get(self.csv_url, stream=True))
         elif extension == ".zip":
-            basename = os.path.basename(self.csv_url)
-            if not self.encoding:
-                self.encoding = "utf-8"
-            try:
-                response = requests.get(self.csv_url, stream=True)
-                with open(basename, "wb") as f:
-                    for chunk in response.iter_content():
-                        f.write(chunk)
-                with ZipFile(basename).open(self.filename, "r") as fp:
-                    data = StringIO(fp.read().decode(self.encoding))
-            finally:
-                os.unlink(basename)
-        else:
-            data = None
+            data = iter_zip_lines(self.get(self.csv_url, stream=True), self.filename, self.encoding or "utf-8")
 
         reader = self.csv_reader(
             self.csv_url,
-            delimiter=self.delimiter,
+            delimiter=delimiter,
             header=True,
             encoding=self.encoding,
-            skip_rows=self.skip_rows,
+            skip_rows=skip_rows,
             data=data,
         )
         reader.fieldnames = [self.header_converter(field) for field in reader.fieldnames]
+        # Exclude the requests, which are timed separately.
+        seconds -= sum(record["seconds"] for record in self.timings[requests_made:])
+        steps = self.row_steps(reader.fieldnames)
+        format_district = self.district_formatter()
+        organization_classification = self.organization_classification or self.jurisdiction.classification
         for row in reader:
-            # ca_qc_laval: "maire et president du comite executif", "conseiller et membre du comite executif"
-            # ca_qc_montreal: "Conseiller de la ville; Membre…", "Maire d'arrondissement\nMembre…"
-            if row.get("primary role"):
-                row["primary role"] = re.split(r"(?: (?:et)\b|[;\n])", row["primary role"], maxsplit=1)[0].strip()
+            rows += 1
+            for step in steps:
+                if not step(row):
+                    break
+            else:
+                person = self.person(row, format_district, organization_classification, seat_numbers)
+                seconds += time.perf_counter() - start
+                yield person
+                start = time.perf_counter()
+        seconds += time.perf_counter() - start
+        self.timings.append(timings.parse_record(self.csv_url, "csv", seconds, rows=rows))
+
+    def feature_layer_lines(self):
+        """
+        Return a file of CSV lines of the rows of `feature_layer_url`, with the columns that the scraper reads, or None
+        if the query fails or lacks required columns.
+        """
+        columns = CSV_COLUMNS | set(self.corrections) | set(self.fallbacks.values()) | set(self.extra_columns)
+        if self.district_name_format_string:
+            columns.update(name for _, name, _, _ in Formatter().parse(self.district_name_format_string) if name)
 
-            if not self.is_valid_row(row):
-                continue
+        try:
+            names, data = arcgis.read_lines(
+                self.get, self.feature_layer_url, lambda name: self.header_converter(name) in columns
+            )
+        except (requests.RequestException, ValueError, KeyError, arcgis.ArcGISError) as e:
+            self.warning("Reading %s instead of %s: %s", self.csv_url, self.feature_layer_url, e)
+            return None
 
-            for key, corrections in self.corrections.items():
-                if not isinstance(corrections, dict):
-                    row[key] = corrections(row[key])
-                elif row[key] in corrections:
-                    row[key] = corrections[row[key]]
+        headers = {self.header_converter(name) for name in names}
+        if not (
+            {"primary role", "email"} <= headers and ("name" in headers or {"first name", "last name"} <= headers)
+        ):
+            self.warning("Reading %s instead of %s: missing required columns", self.csv_url, self.feature_layer_url)
+            return None
+        return data
 
-            # ca_qc_montreal
-            if row.get("last name") and not re.search(r"[a-z]", row["last name"]):
-                row["last name"] = re.sub(r"(?<=\b[A-Z])[A-ZÀÈÉ]+\b", lambda x: x.group(0).lower(), row["last name"])
+    def row_steps(self, fieldnames):
+        """
+        Return the steps that normalize a row, in order.
 
-            if row.get("first name") and row.get("last name"):
-                name = "{} {}".format(row["first name"], row["last name"])
-            else:
-                name = row["name"]
+        Each step modifies the row in place, and returns whether to keep the row. The steps are resolved from the
+        scraper's configuration and the CSV's columns once, instead of for every row.
+        """
+        steps = []
 
-            province = row.get("province")
-            role = row["primary role"]
+        if "primary role" in fieldnames:
+            # ca_qc_laval: "maire et president du comite executif", "conseiller et membre du comite executif"
+            # ca_qc_montreal: "Conseiller de la ville; Membre…", "Maire d'arrondissement\nMembre…"
+            def split_primary_role(row):
+                if row["primary role"]:
+                    row["primary role"] = primary_role_re.split(row["primary role"], maxsplit=1)[0].strip()
+                return True
 
-            # ca_qc_laval: "maire …", "conseiller …"
-            if role not in ("candidate", "member") and not re.search(r"[A-Z]", role):
-                role = role.capitalize()
+            steps.append(split_primary_role)
 
-            if self.district_name_format_string:
-                if row["district id"]:
-                    district = self.district_name_format_string.format(**row)
-                else:
-                    district = self.jurisdiction.division_name
-            elif self.district_name_format_callback:
-                if row.get("district name"):
-                    district = self.district_name_format_callback(row["district name"])
-                else:
-                    district = self.district_name_format_callback(self.jurisdiction.division_name)
-            elif row.get("district name"):
-                district = row["district name"]
-            elif self.fallbacks.get("district name"):
-                district = row[self.fallbacks["district name"]] or self.jurisdiction.division_name
-            else:
-                district = self.jurisdiction.division_name
+        steps.append(self.is_valid_row)
 
-            district = district.replace("–", "—")  # n-dash, m-dash
+        for key, corrections in self.corrections.items():
+            correct = corrections if not isinstance(corrections, dict) else partial(correct_value, corrections)
+            steps.append(partial(correct_column, key, correct))
 
+        if "last name" in fieldnames:
             # ca_qc_montreal
-            if district == "Ville-Marie" and role == "Maire de la Ville de Montréal":
-                district = self.jurisdiction.division_name
-
-            if self.many_posts_per_area and role not in self.unique_roles:
-                seat_numbers[role][district] += 1
-                district = f"{district} (seat {seat_numbers[role][district]})"
-
-            lines = []
-            if row.get("address line 1"):
-                lines.append(row["address line 1"])
-            if row.get("address line 2"):
-                lines.append(row["address line 2"])
-            if row.get("locality"):
-                parts = [row["locality"]]
-                if province:
-                    parts.append(province)
-                if row.get("postal code"):
-                    parts.extend(["", row["postal code"]])
-                lines.append(" ".join(parts))
-
-            organization_classification = self.organization_classification or self.jurisdiction.classification
-            p = CanadianPerson(
-                primary_org=organization_classification,
-                name=name,
-                district=district,
-                role=role,
-                party=row.get("party name"),
-            )
-            p.add_source(self.csv_url)
-
-            # ca_on_toronto_candidates:
-            #   District name,District ID,…
-            #   Toronto Centre,,…
-            #   ,3520005,…
-            if not row.get("district name") and row.get("district id") and len(row["district id"]) == 7:
-                p._related[0].extras["boundary_url"] = "/boundaries/census-subdivisions/{}/".format(row["district id"])
-
-            if row.get("district name") in self.district_name_to_boundary_url:
-                p._related[0].extras["boundary_url"] = self.district_name_to_boundary_url[row["district name"]]
-
-            if row.get("gender"):
-                p.gender = row["gender"]
-            if row.get("photo url"):
-                p.image = row["photo url"]
-
-            if row.get("source url"):
-                p.add_source(row["source url"])
-
-            if row.get("website"):
-                p.add_link(row["website"], note="web site")
-            if row.get("facebook"):
-                p.add_link(re.sub(r"[#?].+", "", row["facebook"]))
-            if row.get("twitter"):
-                p.add_link(row["twitter"])
-
-            if row["email"]:
-                p.add_contact("email", row["email"].strip().split("\n")[-1])  # ca_qc_montreal
-            if lines:
-                p.add_contact("address", "\n".join(lines), "legislature")
-            if row.get("phone"):
-                p.add_contact("voice", row["phone"].split(";", 1)[0], "legislature")  # ca_qc_montreal, ca_on_huron
-            if row.get("fax"):
-                p.add_contact("fax", row["fax"], "legislature")
-            if row.get("cell"):
-                p.add_contact("cell", row["cell"], "legislature")
-            if row.get("birth date"):
-                p.birth_date = row["birth date"]
-
-            if row.get("incumbent"):
-                p.extras["incumbent"] = row["incumbent"]
-
-            if name in self.other_names:
-                for other_name in self.other_names[name]:
-                    p.add_name(other_name)
-
-            yield p
+            def lowercase_last_name(row):
+                if row["last name"] and not lowercase_re.search(row["last name"]):
+                    row["last name"] = uppercase_last_name_re.sub(lowercase_match, row["last name"])
+                return True
+
+            steps.append(lowercase_last_name)
+
+        return steps
+
+    def district_formatter(self):
+        """Return a function that returns a row's district name, according to the scraper's configuration."""
+        division_name = self.jurisdiction.division_name
+
+        if self.district_name_format_string:
+            format_string = self.district_name_format_string
+            return lambda row: format_string.format(**row) if row["district id"] else division_name
+        if self.district_name_format_callback:
+            callback = self.district_name_format_callback
+            return lambda row: callback(row.get("district name") or division_name)
+        if self.fallbacks.get("district name"):
+            fallback = self.fallbacks["district name"]
+            return lambda row: row.get("district name") or row[fallback] or division_name
+        return lambda row: row.get("district name") or division_name
+
+    def person(self, row, format_district, organization_classification, seat_numbers):
+        """Build a person from a normalized row."""
+        if row.get("first name") and row.get("last name"):
+            name = "{} {}".format(row["first name"], row["last name"])
+        else:
+            name = row["name"]
+
+        province = row.get("province")
+        role = row["primary role"]
+
+        # ca_qc_laval: "maire …", "conseiller …"
+        if role not in ("candidate", "member") and not uppercase_re.search(role):
+            role = role.capitalize()
+
+        district = format_district(row).replace("–", "—")  # n-dash, m-dash
+
+        # ca_qc_montreal
+        if district == "Ville-Marie" and role == "Maire de la Ville de Montréal":
+            district = self.jurisdiction.division_name
+
+        if self.many_posts_per_area and role not in self.unique_roles:
+            seat_numbers[role][district] += 1
+            district = f"{district} (seat {seat_numbers[role][district]})"
+
+        lines = []
+        if row.get("address line 1"):
+            lines.append(row["address line 1"])
+        if row.get("address line 2"):
+            lines.append(row["address line 2"])
+        if row.get("locality"):
+            parts = [row["locality"]]
+            if province:
+                parts.append(province)
+            if row.get("postal code"):
+                parts.extend(["", row["postal code"]])
+            lines.append(" ".join(parts))
+
+        p = CanadianPerson(
+            primary_org=organization_classification,
+            name=name,
+            district=district,
+            role=role,
+            party=row.get("party name"),
+        )
+        p.add_source(self.csv_url)
+
+        # ca_on_toronto_candidates:
+        #   District name,District ID,…
+        #   Toronto Centre,,…
+        #   ,3520005,…
+        if not row.get("district name") and row.get("district id") and len(row["district id"]) == 7:
+            p._related[0].extras["boundary_url"] = "/boundaries/census-subdivisions/{}/".format(row["district id"])
+
+        if row.get("district name") in self.district_name_to_boundary_url:
+            p._related[0].extras["boundary_url"] = self.district_name_to_boundary_url[row["district name"]]
+
+        if row.get("gender"):
+            p.gender = row["gender"]
+        if row.get("photo url"):
+            p.image = row["photo url"]
+
+        if row.get("source url"):
+            p.add_source(row["source url"])
+
+        if row.get("website"):
+            p.add_link(row["website"], note="web site")
+        if row.get("facebook"):
+            p.add_link(facebook_query_re.sub("", row["facebook"]))
+        if row.get("twitter"):
+            p.add_link(row["twitter"])
+
+        if row["email"]:
+            p.add_contact("email", row["email"].strip().split("\n")[-1])  # ca_qc_montreal
+        if lines:
+            p.add_contact("address", "\n".join(lines), "legislature")
+        if row.get("phone"):
+            p.add_contact("voice", row["phone"].split(";", 1)[0], "legislature")  # ca_qc_montreal, ca_on_huron
+        if row.get("fax"):
+            p.add_contact("fax", row["fax"], "legislature")
+        if row.get("cell"):
+            p.add_contact("cell", row["cell"], "legislature")
+        if row.get("birth date"):
+            p.birth_date = row["birth date"]
+
+        if row.get("incumbent"):
+            p.extras["incumbent"] = row["incumbent"]
+
+        if name in self.other_names:
+            for other_name in self.other_names[name]:
+                p.add_name(other_name)
+
+        return p
 
 
 class CanadianJurisdiction(Jurisdiction):
@@ -689,45 +1294,23 @@ class CanadianPerson(Person):
 
     def clean_telephone_number(self, s, area_code=None):
         """@see http://www.btb.termiumplus.gc.ca/tpv2guides/guides/favart/index-eng.html?lang=eng&lettr=indx_titls&page=9N6fM9QmOwCE.html."""
-        splits = re.split(r"(?:\b \(|/|x|ext[.:]?|p\.?|poste)[\s-]?(?=\b|\d)", s, flags=re.IGNORECASE)
-        digits = re.sub(r"\D", "", splits[0])
-
-        if len(digits) == 7 and area_code:
-            digits = "1" + str(area_code) + digits
-        elif len(digits) == 10:
-            digits = "1" + digits
-
-        if len(digits) == 11 and digits[0] == "1" and len(splits) <= 2:
-            digits = re.sub(r"\A(\d)(\d{3})(\d{3})(\d{4})\Z", r"\1 \2 \3-\4", digits)
-            if len(splits) == 2:
-                return "{} x{}".format(digits, splits[1].rstrip(")"))
-            return digits
-        return s
+        return phone.clean(str(s), area_code)
 
     def clean_address(self, s):
         """Correct the postal code, abbreviate the province or territory name, and format the last line of the address."""
-        # The letter "O" instead of the numeral "0" is a common mistake.
-        s = re.sub(
-            r"\b[A-Z][O0-9][A-Z]\s?[O0-9][A-Z][O0-9]\b", lambda x: x.group(0).replace("O", "0"), clean_string(s)
-        )
-        for k, v in province_or_territory_abbreviations().items():
-            # Replace a province/territory name with its abbreviation.
-            s = re.sub(
-                r"[,\n ]+"
-                r"\(?" + k + r"\)?"
-                r"(?=(?:[,\n ]+Canada)?(?:[,\n ]+[A-Z][0-9][A-Z]\s?[0-9][A-Z][0-9])?\Z)",
-                " " + v,
-                s,
-            )
-        # Add spaces between province/territory abbreviation, FSA and LDU and remove "Canada".
-        return re.sub(
-            r"[,\n ]+" r"([A-Z]{2})" r"(?:[,\n ]+Canada)?" r"[,\n ]+([A-Z][0-9][A-Z])\s?([0-9][A-Z][0-9])" r"\Z",
-            r" \1  \2 \3",
-            s,
-        )
+        return clean_address(s)
 
 
 whitespace_re = re.compile(r"\s+", flags=re.UNICODE)
+primary_role_re = re.compile(r"(?: (?:et)\b|[;\n])")
+lowercase_re = re.compile(r"[a-z]")
+uppercase_re = re.compile(r"[A-Z]")
+uppercase_last_name_re = re.compile(r"(?<=\b[A-Z])[A-ZÀÈÉ]+\b")
+facebook_query_re = re.compile(r"[#?].+")
+postal_code_re = re.compile(r"\b[A-Z][O0-9][A-Z]\s?[O0-9][A-Z][O0-9]\b")
+address_last_line_re = re.compile(
+    r"[,\n ]+" r"([A-Z]{2})" r"(?:[,\n ]+Canada)?" r"[,\n ]+([A-Z][0-9][A-Z])\s?([0-9][A-Z][0-9])" r"\Z"
+)
 whitespace_and_newline_re = re.compile(r"[^\S\n]+", flags=re.UNICODE)
 honorific_prefix_re = re.compile(r"\A(?:Councillor|Dr|Hon|M|Mayor|Mme|Mr|Mrs|Ms|Miss)\.? ")
 honorific_suffix_re = re.compile(r", (?:Ph\.D, Q\.C\.)\Z")
@@ -743,14 +1326,50 @@ table = {
 def province_or_territory_abbreviations():
     if not province_or_territory_abbreviation_memo:
         province_or_territory_abbreviation_memo["PEI"] = "PE"
-        for division in Division.all("ca"):
-            if division._type in ("province", "territory"):
-                abbreviation = division.id.rsplit(":", 1)[1].upper()
-                province_or_territory_abbreviation_memo[division.name] = abbreviation
-                province_or_territory_abbreviation_memo[division.attrs["name_fr"]] = abbreviation
+        for division in [*Division.by_type("ca", "province"), *Division.by_type("ca", "territory")]:
+            abbreviation = division.id.rsplit(":", 1)[1].upper()
+            province_or_territory_abbreviation_memo[division.name] = abbreviation
+            province_or_territory_abbreviation_memo[division.attrs["name_fr"]] = abbreviation
     return province_or_territory_abbreviation_memo
 
 
+@lru_cache(maxsize=1)
+def province_or_territory_abbreviation_re():
+    """Return a regular expression that matches any province or territory name at the end of an address."""
+    # Longer names first, so that no name matches a prefix of another.
+    names = sorted(province_or_territory_abbreviations(), key=len, reverse=True)
+    return re.compile(
+        r"[,\n ]+"
+        r"\(?(" + "|".join(re.escape(name) for name in names) + r")\)?"
+        r"(?=(?:[,\n ]+Canada)?(?:[,\n ]+[A-Z][0-9][A-Z]\s?[0-9][A-Z][0-9])?\Z)"
+    )
+
+
+@lru_cache(maxsize=1024)
+def compile_xpath(expression):
+    return etree.XPath(expression)
+
+
+@lru_cache(maxsize=256)
+def compile_css(selector):
+    # cssselect is an optional dependency of lxml, imported only if used.
+    from lxml.cssselect import CSSSelector  # noqa: PLC0415
+
+    return CSSSelector(selector, translator="html")
+
+
+# City councillors often share their city hall's address.
+@lru_cache(maxsize=4096)
+def clean_address(s):
+    # The letter "O" instead of the numeral "0" is a common mistake.
+    s = postal_code_re.sub(lambda x: x.group(0).replace("O", "0"), clean_string(s))
+    # Replace a province/territory name with its abbreviation.
+    abbreviations = province_or_territory_abbreviations()
+    s = province_or_territory_abbreviation_re().sub(lambda x: " " + abbreviations[x.group(1)], s)
+    # Add spaces between province/territory abbreviation, FSA and LDU and remove "Canada".
+    return address_last_line_re.sub(r" \1  \2 \3", s)
+
+
 def clean_string(s):
     return re.sub(r" *\n *", "\n", whitespace_and_newline_re.sub(" ", str(s).translate(table)).strip())
 
@@ -773,3 +1392,121 @@ def clean_type_id(type_id):
 
 def clean_french_prepositions(s):
     return re.sub(r"\b(?:d'|de (?:l'|la )?|du |des |l')", "", clean_string(s), flags=re.IGNORECASE)
+
+
+def correct_value(corrections, value):
+    return corrections.get(value, value)
+
+
+def correct_column(key, correct, row):
+    row[key] = correct(row[key])
+    return True
+
+
+def lowercase_match(match):
+    return match.group(0).lower()
+
+
+def iter_lines(chunks, encoding=None):
+    """
+    Decode chunks of bytes incrementally, and yield lines, like `StringIO(text.strip().removeprefix("\ufeff"))`.
+
+    If the encoding is unknown, it is detected from the first chunk.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+    if not encoding:
+        encoding = requests.compat.chardet.detect(first)["encoding"] or "utf-8"
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    buffer = ""
+    started = False
+    # The last non-blank line and the blank lines after it are held back, to strip trailing whitespace.
+    pending = None
+    blanks = []
+    for chunk in chain([first], chunks, [None]):
+        final = chunk is None
+        text = decoder.decode(b"" if final else chunk, final=final)
+        if not started:
+            text = text.lstrip()
+            if not text:
+                continue
+            text = text.removeprefix("\ufeff")  # BOM
+            started = True
+
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        lines = [f"{line}\n" for line in lines]
+        if final:
+            lines.append(buffer)
+        for line in lines:
+            if line.strip():
+                if pending is not None:
+                    yield pending
+                yield from blanks
+                blanks = []
+                pending = line
+            else:
+                blanks.append(line)
+
+    if pending is not None:
+        yield pending.rstrip()
+
+
+def iter_zip_lines(response, filename, encoding):
+    """Yield the lines of a file in a ZIP archive, without reading the file into memory."""
+    with seekable(response) as f, ZipFile(f) as zipfile, zipfile.open(filename) as member:
+        yield from TextIOWrapper(member, encoding=encoding, newline="\n")
+
+
+def iter_xlsx_lines(response):
+    """Yield the rows of the active sheet of an XLSX file, as CSV lines, without reading the sheet into memory."""
+    with seekable(response) as f:
+        workbook = openpyxl.load_workbook(f, read_only=True, data_only=True)
+        yield from iter_sheet_lines(workbook, workbook.active)
+
+
+def iter_sheet_lines(workbook, sheet):
+    """Yield the rows of a sheet of a read-only workbook, as CSV lines, and close the workbook."""
+    try:
+        # Like agate-excel, don't trust the dimensions in the file's properties if they are obviously wrong.
+        if sheet.max_column == 1 and sheet.max_row == 1:
+            sheet.reset_dimensions()
+
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        for i, row in enumerate(sheet.iter_rows(values_only=True)):
+            if i:
+                writer.writerow([format_cell(value) for value in row])
+            else:
+                # Like agate, name unnamed columns with letters.
+                writer.writerow([agate.utils.letter_name(j) if v is None else v for j, v in enumerate(row)])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    finally:
+        workbook.close()
+
+
+def format_cell(value):
+    """Format a spreadsheet cell's value like agate's CSV output."""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        if value.time() == datetime.min.time():
+            return value.date().isoformat()
+        return value.isoformat()
+    return str(value)
+
+
+@contextmanager
+def seekable(response):
+    """Yield a seekable file with the body of a streamed response."""
+    # A response from the HTTP cache streams from a file on disk.
+    if isinstance(response.raw, BufferedReader):
+        yield response.raw
+    else:
+        with tempfile.TemporaryFile() as f:
+            f.writelines(response.iter_content(chunk_size=CHUNK_SIZE))
+            f.seek(0)
+            yield f